@@ -0,0 +1,46 @@
+"""
+Long-lived Blender entry point that renders many scenes in one process.
+
+Run inside Blender, reading one scene directory per line from stdin:
+    blender --background --python blender_driver.py
+
+For every scene the default startup file is reloaded, the working directory is
+switched to the scene directory and place_in_blender.py is executed. Once the
+scene is finished a DONE or FAILED marker line is printed to stdout, so the
+caller (see blender_worker.py) knows when to send the next one.
+"""
+
+import os
+import runpy
+import sys
+import traceback
+
+import bpy
+
+DONE_MARKER = "IDESIGN_BLENDER_DONE"
+FAILED_MARKER = "IDESIGN_BLENDER_FAILED"
+PLACE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "place_in_blender.py")
+
+
+def render_scene(scene_dir):
+    # Start every scene from the same state a fresh `blender --background` has
+    bpy.ops.wm.read_homefile(use_empty=False)
+    os.chdir(scene_dir)
+    runpy.run_path(PLACE_SCRIPT, run_name="__main__")
+
+
+def main():
+    for line in sys.stdin:
+        scene_dir = line.strip()
+        if not scene_dir:
+            continue
+        try:
+            render_scene(scene_dir)
+            print(DONE_MARKER, flush=True)
+        except Exception:
+            traceback.print_exc()
+            sys.stderr.flush()
+            print(FAILED_MARKER, flush=True)
+
+
+main()
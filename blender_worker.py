@@ -0,0 +1,166 @@
+"""
+Client for a persistent headless Blender process running blender_driver.py.
+
+Starting Blender (Python init, addon loading, color management) costs several
+seconds, which dominates short renders. A BlenderWorker launches Blender once and
+sends it scene directories over stdin, restarting it only if it crashes or hangs.
+
+Usage:
+    worker = BlenderWorker(BLENDER_PATH, script_dir)
+    ok, output = worker.render(scene_dir, timeout=1800, log_file=scene_dir / "blender.log")
+    worker.close()
+"""
+
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# Must match the markers printed by blender_driver.py
+DONE_MARKER = "IDESIGN_BLENDER_DONE"
+FAILED_MARKER = "IDESIGN_BLENDER_FAILED"
+OUTPUT_TAIL_LINES = 50  # Lines of Blender output kept for error reporting
+
+
+class BlenderWorker:
+    """A long-lived Blender process that renders scenes one at a time."""
+
+    def __init__(self, blender_path: str, script_dir: Path, threads: int = 0, env: dict = None):
+        """
+        Args:
+            blender_path: Path to the Blender executable
+            script_dir: Directory containing blender_driver.py and place_in_blender.py
+            threads: Render threads for Blender (0 lets Blender use all cores)
+            env: Environment for the Blender process (default: inherit)
+        """
+        self.blender_path = blender_path
+        self.driver_script = Path(script_dir) / "blender_driver.py"
+        self.threads = threads
+        self.env = env
+        self.proc = None
+        self.lines = None
+
+    def start(self):
+        """Launch the Blender process and the thread draining its output."""
+        self.proc = subprocess.Popen(
+            [
+                self.blender_path, "--background", "-t", str(self.threads),
+                "--python", str(self.driver_script),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",  # Stray non-UTF-8 bytes must not kill the reader thread
+            bufsize=1,
+            env=self.env,
+        )
+        # Drain stdout on a separate thread so a chatty render can never fill the
+        # pipe, and so render() can wait for the marker with a timeout
+        self.lines = queue.Queue()
+        threading.Thread(
+            target=self._read_output, args=(self.proc.stdout, self.lines), daemon=True
+        ).start()
+
+    @staticmethod
+    def _read_output(stream, lines: queue.Queue):
+        try:
+            for line in stream:
+                lines.put(line.rstrip("\n"))
+        finally:
+            lines.put(None)  # EOF - the process exited (or the stream broke)
+
+    def is_running(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def render(self, scene_dir: Path, timeout: float = None, log_file: Path = None) -> tuple:
+        """
+        Render a scene in the persistent Blender process.
+
+        Args:
+            scene_dir: Directory containing scene_graph.json and Assets/
+            timeout: Seconds to wait before killing the process (None waits forever)
+            log_file: File receiving Blender's full output for this scene, line by line
+
+        Returns:
+            (success, output) where output is the tail of Blender's output
+
+        Raises:
+            TimeoutError: The render did not finish within timeout; the process was killed
+        """
+        if not self.is_running():
+            self.start()
+
+        try:
+            self.proc.stdin.write(f"{Path(scene_dir).resolve()}\n")
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            # Died between scenes - start over once
+            self.close()
+            self.start()
+            self.proc.stdin.write(f"{Path(scene_dir).resolve()}\n")
+            self.proc.stdin.flush()
+
+        # Only the tail is kept in memory; the full output goes to log_file if given
+        tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        log = open(log_file, "w", buffering=1) if log_file is not None else None
+        try:
+            return self._wait_for_result(tail, log, timeout)
+        finally:
+            if log is not None:
+                log.close()
+
+    def _wait_for_result(self, tail: deque, log, timeout: float) -> tuple:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self.kill()
+                raise TimeoutError(f"Blender timed out after {timeout}s")
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            except BaseException:
+                # Interrupted mid-render (e.g. by a signal handler); the process would
+                # otherwise report this scene's result for the next one
+                self.kill()
+                raise
+
+            if line is None:
+                # The process may also have been killed from another thread
+                proc, self.proc = self.proc, None
+                tail.append(
+                    "Blender was killed" if proc is None
+                    else f"Blender exited with code {proc.wait()}"
+                )
+                return False, "\n".join(tail)
+            if line == DONE_MARKER:
+                return True, "\n".join(tail)
+            if line == FAILED_MARKER:
+                return False, "\n".join(tail)
+            tail.append(line)
+            if log is not None:
+                log.write(line + "\n")
+
+    def kill(self):
+        """Kill the Blender process immediately."""
+        if self.proc is None:
+            return
+        self.proc.kill()
+        self.proc.wait()
+        self.proc = None
+
+    def close(self):
+        """Stop the Blender process, killing it if it does not exit promptly."""
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=10)
+            except (BrokenPipeError, subprocess.TimeoutExpired):
+                self.kill()
+        self.proc = None
@@ -10,83 +10,83 @@ Usage:
 """
 
 import argparse
+import hashlib
 import sys
 import re
 import os
 import json
+import threading
+import numpy as np
 from IDesign import IDesign
 
+# On-disk cache of auto-mode responses, keyed by a hash of the full request
+AUTO_PARAMS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "idesign", "auto_params")
+AUTO_PARAMS_MODEL = "gpt-4"
+AUTO_PARAMS_TEMPERATURE = 0.3
+# Routing hint for OpenAI prompt caching; bump the version when the system prompt changes
+AUTO_PARAMS_PROMPT_CACHE_KEY = "idesign-auto-params-v1"
+# Fields generate_scene reads from an auto-mode response, with their accepted types
+AUTO_PARAMS_FIELDS = {
+    "room_type": str,
+    "reasoning": str,
+    "width": (int, float),
+    "depth": (int, float),
+    "height": (int, float),
+    "num_objects": int,
+}
 
-def get_openai_client():
-    """Get OpenAI client for auto mode."""
-    try:
-        from openai import OpenAI
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-        return OpenAI(api_key=api_key)
-    except ImportError:
-        raise ImportError("openai package required for --auto mode. Install with: pip install openai")
-
+# Semantic cache: paraphrased prompts reuse the parameters of a similar cached prompt.
+# Needs the optional sentence-transformers package and is skipped without it
+SEMANTIC_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "idesign", "auto_params_vec.npz")
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_HIT_THRESHOLD = 0.95  # Reuse directly at or above this cosine similarity
+SEMANTIC_VERIFY_THRESHOLD = 0.85  # Ask a cheap model to confirm between the two thresholds
+SEMANTIC_VERIFY_MODEL = "gpt-3.5-turbo"
 
-def auto_determine_parameters(prompt: str) -> dict:
-    """
-    Use GPT-4 to determine optimal room dimensions and object count based on the prompt.
+# Keep-alive pool of the shared auto-mode client
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20
+OPENAI_KEEPALIVE_EXPIRY = 300  # Seconds an idle connection stays open
 
-    This approach is inspired by SceneWeaver's evaluation methodology where scene completeness
-    is measured by object density and functional coverage.
-    """
-    client = get_openai_client()
+_embedding_model = None
+_embedding_model_lock = threading.Lock()
+# Auto mode runs on several threads with prefetching (see run_from_csv.py); appends to
+# the semantic cache file must not overwrite each other
+_semantic_cache_lock = threading.Lock()
+_openai_client = None
+_openai_client_lock = threading.Lock()
 
-    system_prompt = """You are an expert interior designer. Given a room description, determine:
-1. Optimal room dimensions (width, depth, height in meters)
-2. Appropriate number of objects to place
 
-Consider:
-- Room type and typical sizes (e.g., bathrooms are smaller than living rooms)
-- Descriptive words like "spacious", "cozy", "large", "small"
-- Functional requirements (a home office needs desk, chair, shelving; a bedroom needs bed, nightstands)
-- Scene completeness - rooms should feel furnished but not cluttered
-- For bedrooms: typically 8-15 objects
-- For living rooms: typically 12-20 objects
-- For offices: typically 8-12 objects
-- For studios/open plans: typically 15-25 objects
-
-Respond with ONLY a JSON object in this exact format:
-{
-    "room_type": "detected room type",
-    "width": <float>,
-    "depth": <float>,
-    "height": <float>,
-    "num_objects": <int>,
-    "reasoning": "brief explanation"
-}"""
-
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Room description: {prompt}"}
-        ],
-        temperature=0.3,
-    )
-
-    content = response.choices[0].message.content
-    # Extract JSON from response (handle potential markdown code blocks)
-    if "```" in content:
-        match = re.search(r'```(?:json)?\s*([^`]+)\s*```', content, re.DOTALL)
-        if match:
-            content = match.group(1).strip()
+def get_openai_client():
+    """
+    Get the OpenAI client for auto mode.
 
-    # Try to parse directly first, then extract JSON object if that fails
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        # LLM sometimes adds extra text after JSON - extract just the JSON object
-        match = re.search(r'\{[^{}]*\}', content, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-        raise  # Re-raise if we can't find valid JSON
+    One client is shared by all scenes and retries in the process (including the
+    prefetch threads of run_from_csv.py), so its pooled connections are reused
+    instead of paying a TCP and TLS handshake per request.
+    """
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is not None:
+            return _openai_client
+        try:
+            import httpx
+            from openai import DefaultHttpxClient, OpenAI
+            api_key = os.environ.get("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable not set")
+            _openai_client = OpenAI(
+                api_key=api_key,
+                # Keeps the OpenAI defaults (e.g. the long request timeout) for the rest
+                http_client=DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+                    ),
+                ),
+            )
+            return _openai_client
+        except ImportError:
+            raise ImportError("openai package required for --auto mode. Install with: pip install openai")
 
 
 # Default room configurations based on room type
@@ -144,15 +144,331 @@ DEFAULT_CONFIG = {
     "objects": 12,
 }
 
+# Single alternation over all room types, longest first so that e.g. "home office"
+# wins over "office" when both match at the same position
+ROOM_TYPE_RE = re.compile(
+    "|".join(re.escape(room_type) for room_type in sorted(ROOM_PRESETS, key=len, reverse=True)),
+    re.IGNORECASE,
+)
+
+
+# The system prompt is fully static (presets and examples included) and the room
+# description is only appended at the very end of the user message. This keeps the
+# request prefix byte-identical across prompts and above the 1024-token minimum for
+# OpenAI's automatic prompt caching.
+AUTO_PARAMS_SYSTEM_PROMPT = """You are an expert interior designer. Given a room description, determine:
+1. Optimal room dimensions (width, depth, height in meters)
+2. Appropriate number of objects to place
+
+Consider:
+- Room type and typical sizes (e.g., bathrooms are smaller than living rooms)
+- Descriptive words like "spacious", "cozy", "large", "small"
+- Functional requirements (a home office needs desk, chair, shelving; a bedroom needs bed, nightstands)
+- Scene completeness - rooms should feel furnished but not cluttered
+- For bedrooms: typically 8-15 objects
+- For living rooms: typically 12-20 objects
+- For offices: typically 8-12 objects
+- For studios/open plans: typically 15-25 objects
+
+Reference defaults per room type (dimensions are [width, depth, height] in meters,
+objects is the typical object count). Use these as a starting point and adjust for
+the size, style and functional requirements in the description:
+""" + json.dumps(ROOM_PRESETS, indent=4) + """
+
+Guidelines for adjusting the defaults:
+- "spacious", "large", "grand", "luxurious": increase width and depth by 20-50%
+- "cozy", "small", "compact", "tiny": decrease width and depth by 10-30%
+- "loft", "vaulted", "double-height": increase height to 3.0-4.5m
+- "basement", "attic": keep height between 2.2m and 2.4m
+- Multiple functions in one room (e.g., "bedroom with reading nook and desk") add 2-5 objects
+- "minimalist" or "sparse" descriptions remove 2-5 objects
+- Keep width and depth between 2.0m and 10.0m, height between 2.2m and 4.5m
+- Keep the number of objects between 4 and 30
+
+Examples:
+
+Room description: A cozy minimalist bedroom
+{
+    "room_type": "bedroom",
+    "width": 3.5,
+    "depth": 3.5,
+    "height": 2.5,
+    "num_objects": 8,
+    "reasoning": "Cozy suggests a slightly smaller bedroom and minimalist reduces the object count to the essentials."
+}
+
+Room description: A spacious modern living room with a reading corner and a large TV wall
+{
+    "room_type": "living room",
+    "width": 6.5,
+    "depth": 5.5,
+    "height": 2.7,
+    "num_objects": 18,
+    "reasoning": "Spacious living room enlarged from the default, with extra objects for the reading corner and TV wall."
+}
+
+Room description: A small home office for remote work
+{
+    "room_type": "home office",
+    "width": 3.0,
+    "depth": 3.0,
+    "height": 2.5,
+    "num_objects": 8,
+    "reasoning": "Small office needs a desk, chair, shelving and a few accessories."
+}
+
+Room description: A luxurious master bathroom with a freestanding tub
+{
+    "room_type": "bathroom",
+    "width": 3.5,
+    "depth": 3.0,
+    "height": 2.6,
+    "num_objects": 8,
+    "reasoning": "Luxurious master bathroom is larger than a standard bathroom to fit a freestanding tub and double vanity."
+}
+
+Room description: An industrial loft studio apartment with a kitchenette and sleeping area
+{
+    "room_type": "studio",
+    "width": 7.0,
+    "depth": 6.0,
+    "height": 3.5,
+    "num_objects": 22,
+    "reasoning": "Open-plan loft combines living, sleeping and kitchen zones with high ceilings."
+}
+
+Respond with ONLY a JSON object in this exact format:
+{
+    "room_type": "detected room type",
+    "width": <float>,
+    "depth": <float>,
+    "height": <float>,
+    "num_objects": <int>,
+    "reasoning": "brief explanation"
+}"""
+
+
+def _auto_params_cache_path(prompt: str) -> str:
+    """Return the cache file path for an auto-mode request."""
+    key = "\x00".join([
+        AUTO_PARAMS_SYSTEM_PROMPT,
+        prompt,
+        AUTO_PARAMS_MODEL,
+        str(AUTO_PARAMS_TEMPERATURE),
+    ])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(AUTO_PARAMS_CACHE_DIR, f"{digest}.json")
+
+
+def _write_atomic(path: str, write_fn, mode: str = "w"):
+    """Write a cache file atomically so concurrent workers never read a partial entry."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, mode) as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+def _embed_prompt(prompt: str):
+    """Return a normalized embedding of the prompt, or None if sentence-transformers is missing."""
+    global _embedding_model
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                _embedding_model = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+            except ImportError:
+                _embedding_model = False
+    if _embedding_model is False:
+        return None
+    return _embedding_model.encode(prompt, normalize_embeddings=True).astype(np.float32)
+
+
+def _semantic_cache_key() -> str:
+    """
+    Identify the request and embedding settings, so entries from an older system prompt
+    or embedding model (whose vectors may have a different size) are ignored.
+    """
+    key = "\x00".join([
+        AUTO_PARAMS_SYSTEM_PROMPT, AUTO_PARAMS_MODEL, str(AUTO_PARAMS_TEMPERATURE),
+        SEMANTIC_CACHE_MODEL,
+    ])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _load_semantic_cache():
+    """Return (vectors, prompts, payloads) from the semantic cache, or None if empty."""
+    if not os.path.exists(SEMANTIC_CACHE_PATH):
+        return None
+    try:
+        with np.load(SEMANTIC_CACHE_PATH) as data:
+            if str(data["key"]) != _semantic_cache_key():
+                return None
+            return (
+                data["vectors"],
+                [str(p) for p in data["prompts"]],
+                [json.loads(str(p)) for p in data["payloads"]],
+            )
+    except (OSError, ValueError, KeyError):
+        return None  # Corrupt or incompatible cache - start over
+
+
+def _save_semantic_cache(vectors, prompts: list, payloads: list):
+    _write_atomic(
+        SEMANTIC_CACHE_PATH,
+        lambda f: np.savez(
+            f,
+            key=np.array(_semantic_cache_key()),
+            vectors=vectors,
+            prompts=np.array(prompts, dtype=str),
+            payloads=np.array([json.dumps(p) for p in payloads], dtype=str),
+        ),
+        mode="wb",
+    )
+
+
+def _same_room_intent(client, cached_prompt: str, prompt: str) -> bool:
+    """Ask a cheap model whether two room descriptions need the same parameters."""
+    response = client.chat.completions.create(
+        model=SEMANTIC_VERIFY_MODEL,
+        messages=[
+            {"role": "system", "content": (
+                "You compare two room descriptions for an interior design tool. Answer only "
+                "'yes' if both call for the same room type, room size and amount of furniture, "
+                "otherwise answer only 'no'."
+            )},
+            {"role": "user", "content": f"Description A: {cached_prompt}\nDescription B: {prompt}"},
+        ],
+        temperature=0,
+    )
+    return response.choices[0].message.content.strip().lower().startswith("yes")
+
+
+def _validate_auto_params(params) -> dict:
+    """
+    Check that auto-mode parameters have every field generate_scene reads.
+
+    Raises:
+        ValueError: A field is missing, has the wrong type or is not positive
+    """
+    if not isinstance(params, dict):
+        raise ValueError(f"Auto-mode parameters are not a JSON object: {params!r}")
+    for key, types in AUTO_PARAMS_FIELDS.items():
+        value = params.get(key)
+        if types is int and isinstance(value, float) and value.is_integer():
+            value = params[key] = int(value)  # e.g. "num_objects": 8.0
+        # bool is a subclass of int but never a valid count or dimension
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise ValueError(f"Auto-mode parameters have an invalid {key!r}: {value!r}")
+        if types is not str and value <= 0:
+            raise ValueError(f"Auto-mode parameters have a non-positive {key!r}: {value!r}")
+    return params
+
+
+def _parse_auto_params(content: str) -> dict:
+    """
+    Parse the JSON object out of a GPT-4 auto-mode response.
+
+    Raises:
+        ValueError: The response has no valid parameters (see _validate_auto_params)
+    """
+    # Extract JSON from response (handle potential markdown code blocks)
+    if "```" in content:
+        match = re.search(r'```(?:json)?\s*([^`]+)\s*```', content, re.DOTALL)
+        if match:
+            content = match.group(1).strip()
+
+    # Try to parse directly first, then extract JSON object if that fails
+    try:
+        params = json.loads(content)
+    except json.JSONDecodeError:
+        # LLM sometimes adds extra text after JSON - extract just the JSON object
+        match = re.search(r'\{[^{}]*\}', content, re.DOTALL)
+        if not match:
+            raise  # Re-raise if we can't find valid JSON
+        params = json.loads(match.group(0))
+    # Checked before anything is cached, so a bad response is not replayed on retries
+    return _validate_auto_params(params)
+
+
+def auto_determine_parameters(prompt: str, use_cache: bool = True) -> dict:
+    """
+    Use GPT-4 to determine optimal room dimensions and object count based on the prompt.
+
+    This approach is inspired by SceneWeaver's evaluation methodology where scene completeness
+    is measured by object density and functional coverage.
+
+    Responses are cached on disk under AUTO_PARAMS_CACHE_DIR, so repeated calls with the
+    same prompt skip the API round trip. If sentence-transformers is installed, paraphrases
+    of a cached prompt are also served from SEMANTIC_CACHE_PATH (similar prompts are
+    confirmed with a cheap model first). Pass use_cache=False to force a fresh call.
+    """
+    cache_path = _auto_params_cache_path(prompt)
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                params = _validate_auto_params(json.load(f))
+            print("  Using cached auto-mode parameters")
+            return params
+        except (OSError, ValueError):  # Includes json.JSONDecodeError
+            pass  # Corrupt cache entry - fall through and regenerate
+
+    client = get_openai_client()
+
+    embedding = _embed_prompt(prompt) if use_cache else None
+    cached = _load_semantic_cache() if embedding is not None else None
+    if cached is not None:
+        vectors, prompts, payloads = cached
+        sims = vectors @ embedding
+        best = int(np.argmax(sims))
+        try:
+            params = _validate_auto_params(payloads[best])
+        except ValueError:
+            params = None  # Cached before responses were validated - do not reuse it
+        if params is not None and (
+            sims[best] >= SEMANTIC_HIT_THRESHOLD
+            or (
+                sims[best] >= SEMANTIC_VERIFY_THRESHOLD
+                and _same_room_intent(client, prompts[best], prompt)
+            )
+        ):
+            print(f"  Using cached auto-mode parameters of a similar prompt: {prompts[best]}")
+            _write_atomic(cache_path, lambda f: json.dump(params, f))
+            return params
+
+    response = client.chat.completions.create(
+        model=AUTO_PARAMS_MODEL,
+        messages=[
+            {"role": "system", "content": AUTO_PARAMS_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Room description: {prompt}"}
+        ],
+        temperature=AUTO_PARAMS_TEMPERATURE,
+        extra_body={"prompt_cache_key": AUTO_PARAMS_PROMPT_CACHE_KEY},
+    )
+
+    params = _parse_auto_params(response.choices[0].message.content)
+
+    _write_atomic(cache_path, lambda f: json.dump(params, f))
+    if embedding is not None:
+        # Re-read so entries added by other workers since the lookup are kept
+        with _semantic_cache_lock:
+            cached = _load_semantic_cache()
+            if cached is None:
+                vectors, prompts, payloads = np.empty((0, embedding.shape[0]), dtype=np.float32), [], []
+            else:
+                vectors, prompts, payloads = cached
+            _save_semantic_cache(np.vstack([vectors, embedding]), prompts + [prompt], payloads + [params])
+
+    return params
+
 
 def detect_room_type(prompt: str) -> dict:
     """Detect room type from prompt and return appropriate defaults."""
-    prompt_lower = prompt.lower()
-
-    for room_type, config in ROOM_PRESETS.items():
-        if room_type in prompt_lower:
-            print(f"Detected room type: {room_type}")
-            return config
+    match = ROOM_TYPE_RE.search(prompt)
+    if match:
+        room_type = match.group(0).lower()
+        print(f"Detected room type: {room_type}")
+        return ROOM_PRESETS[room_type]
 
     print("No specific room type detected, using default configuration")
     return DEFAULT_CONFIG
@@ -167,6 +483,7 @@ def generate_scene(
     output_file: str = "scene_graph.json",
     verbose: bool = False,
     auto_mode: bool = False,
+    use_cache: bool = True,
 ):
     """
     Generate a scene from a text prompt.
@@ -180,10 +497,11 @@ def generate_scene(
         output_file: Output JSON file path
         verbose: Print detailed progress
         auto_mode: Use GPT-4 to determine optimal parameters
+        use_cache: Reuse cached GPT-4 auto-mode responses for identical prompts
     """
     if auto_mode:
         print("\n[Auto Mode] Asking GPT-4 to determine optimal room parameters...")
-        auto_params = auto_determine_parameters(prompt)
+        auto_params = auto_determine_parameters(prompt, use_cache=use_cache)
         print(f"  Room type: {auto_params['room_type']}")
         print(f"  Reasoning: {auto_params['reasoning']}")
 
@@ -332,6 +650,13 @@ Room types with auto-detected defaults:
         help="Use GPT-4 to intelligently determine room dimensions and object count based on prompt"
     )
 
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="Ignore cached GPT-4 auto-mode responses and query the API again"
+    )
+
     args = parser.parse_args()
 
     try:
@@ -344,6 +669,7 @@ Room types with auto-detected defaults:
             output_file=args.output,
             verbose=args.verbose,
             auto_mode=args.auto,
+            use_cache=args.use_cache,
         )
     except KeyboardInterrupt:
         print("\n\nGeneration cancelled by user.")
@@ -1,7 +1,27 @@
 import bpy
+import bmesh
+import hashlib
 import json
 import math
 import os
+from collections import Counter
+
+import numpy as np
+from mathutils import Matrix
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Not bundled with Blender's Python; fall back to the stdlib parser
+
+ROOM_LAYOUT_IDS = frozenset(["south_wall", "north_wall", "east_wall", "west_wall", "middle of the room", "ceiling"])
+
+# Render engine: EEVEE (GPU rasterizer, fast previews) or CYCLES (path tracing on GPU if available)
+RENDER_ENGINE = os.environ.get("IDESIGN_RENDER_ENGINE", "EEVEE").upper()
+CYCLES_SAMPLES = 64
+CYCLES_DEVICE_TYPES = ('OPTIX', 'CUDA', 'HIP', 'ONEAPI', 'METAL')  # In order of preference
+# Also write scene.blend next to render.png
+SAVE_BLEND = os.environ.get("IDESIGN_SAVE_BLEND", "0") == "1"
 
 object_name = 'Cube'
 object_to_delete = bpy.data.objects.get(object_name)
@@ -11,34 +31,144 @@ if object_to_delete is not None:
     bpy.data.objects.remove(object_to_delete, do_unlink=True)
 
 def import_glb(file_path, object_name):
-    bpy.ops.import_scene.gltf(filepath=file_path)
+    # The importer selects exactly the objects it creates. Clear the previous import's
+    # selection ourselves too, in case its select_all poll fails in this context
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    # Static render only: keep the imported normals, skip the bind-pose guessing for
+    # skinned assets and do not pack externally referenced images
+    bpy.ops.import_scene.gltf(
+        filepath=file_path,
+        import_shading='NORMALS',
+        bone_heuristic='TEMPERANCE',
+        guess_original_bind_pose=False,
+        import_pack_images=False,
+    )
     imported_object = bpy.context.view_layer.objects.active
     if imported_object is not None:
         imported_object.name = object_name
+    imported_objects = list(bpy.context.selected_objects)
+    return imported_object, imported_objects
+
+def duplicate_imported(imported_object, imported_objects, object_name):
+    # Copy an already imported GLB hierarchy instead of parsing the file again.
+    # Mesh data is copied too, since joining and baking transforms later modify it
+    copies = {}
+    for obj in imported_objects:
+        copy = obj.copy()
+        if obj.data is not None:
+            copy.data = obj.data.copy()
+        for collection in obj.users_collection:
+            collection.objects.link(copy)
+        copies[obj] = copy
+    for obj, copy in copies.items():
+        if obj.parent in copies:
+            copy.parent = copies[obj.parent]
+    root = copies.get(imported_object)
+    if root is not None:
+        root.name = object_name
+
+def join_meshes(meshes, name):
+    # Merge the meshes into one new object with world-space vertices, like
+    # bpy.ops.object.join but without the operator and its depsgraph update
+    bm = bmesh.new()
+    joined_mesh = bpy.data.meshes.new(name)
+    material_indices = {}
+    for obj in meshes:
+        n_verts, n_faces = len(bm.verts), len(bm.faces)
+        bm.from_mesh(obj.data)
+        bm.verts.ensure_lookup_table()
+        bm.faces.ensure_lookup_table()
+        new_faces = bm.faces[n_faces:]
+        # Transform only the appended copy, the source mesh may be shared
+        bmesh.ops.transform(bm, matrix=obj.matrix_world, verts=bm.verts[n_verts:])
+        if obj.matrix_world.is_negative:
+            bmesh.ops.reverse_faces(bm, faces=new_faces)
+
+        # Append this object's materials (once each) and remap its face indices
+        remap = []
+        for slot in obj.material_slots:
+            if slot.material not in material_indices:
+                material_indices[slot.material] = len(joined_mesh.materials)
+                joined_mesh.materials.append(slot.material)
+            remap.append(material_indices[slot.material])
+        if remap:
+            for face in new_faces:
+                face.material_index = remap[min(face.material_index, len(remap) - 1)]
+
+    bm.to_mesh(joined_mesh)
+    bm.free()
+
+    joined_object = bpy.data.objects.new(name, joined_mesh)
+    bpy.context.collection.objects.link(joined_object)
+    bpy.data.batch_remove(ids=meshes)
+    return joined_object
+
+def set_origin_to_bounds_center(obj):
+    # Same result as origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS'), computed
+    # with one vectorized pass over the vertices instead of an operator call
+    mesh = obj.data
+    n = len(mesh.vertices)
+    if n == 0:
+        return
+    co = np.empty(n * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    center = (co.min(axis=0) + co.max(axis=0)) * 0.5
+    co -= center
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.update()
+    obj.matrix_basis = obj.matrix_basis @ Matrix.Translation(center)
+
+def file_digest(file_path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def add_object(name, data, location=(0, 0, 0)):
+    # Link a new object for existing data (camera, light, ...) without an add operator
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+def add_mesh_object(name, vertices, faces, location=(0, 0, 0)):
+    # Build the mesh from raw data and link one object, avoiding the chain of
+    # primitive/edit-mode operators (each with its own undo push and depsgraph update)
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+    return add_object(name, mesh, location)
 
 def create_room(width, depth, height):
-    # Create floor
-    bpy.ops.mesh.primitive_plane_add(size=1, enter_editmode=False, align='WORLD', location=(0, 0, 0))
-
-    # Extrude to create walls
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.extrude_region_move(TRANSFORM_OT_translate={"value":(0, 0, height)})
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    # Scale the walls to the desired dimensions
-    bpy.ops.transform.resize(value=(width, depth, 1))
-
-    bpy.context.active_object.location.x += width / 2
-    bpy.context.active_object.location.y += depth / 2
-
-def find_glb_files(directory):
+    # Closed box with the floor at z=0, centered on the room footprint
+    x, y = width / 2, depth / 2
+    vertices = [
+        (-x, -y, 0), (x, -y, 0), (x, y, 0), (-x, y, 0),
+        (-x, -y, height), (x, -y, height), (x, y, height), (-x, y, height),
+    ]
+    faces = [
+        (0, 3, 2, 1),  # Floor
+        (4, 5, 6, 7),  # Ceiling
+        (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7),  # Walls
+    ]
+    return add_mesh_object("Room", vertices, faces, location=(x, y, 0))
+
+def find_glb_files(directory, needed_keys):
+    # Only look up the requested keys and stop walking once all are found
+    needed = set(needed_keys)
     glb_files = {}
     for root, dirs, files in os.walk(directory):
         for file in files:
             if file.endswith(".glb"):
                 key = file.split(".")[0]
-                if key not in glb_files:
+                if key in needed:
                     glb_files[key] = os.path.join(root, file)
+                    needed.discard(key)
+                    if not needed:
+                        return glb_files
     return glb_files
 
 def get_highest_parent_objects():
@@ -51,88 +181,101 @@ def get_highest_parent_objects():
     return highest_parent_objects
 
 def delete_empty_objects():
-    # Iterate through all objects in the scene
-    for obj in bpy.context.scene.objects:
-        # Check if the object is empty (has no geometry)
-        print(obj.name, obj.type)
-        if obj.type == 'EMPTY':
-            bpy.context.view_layer.objects.active = obj
-            bpy.data.objects.remove(obj)
-
-def select_meshes_under_empty(empty_object_name):
-    # Get the empty object
-    empty_object = bpy.data.objects.get(empty_object_name)
-    print(empty_object is not None)
-    if empty_object is not None and empty_object.type == 'EMPTY':
-        # Iterate through the children of the empty object
-        for child in empty_object.children:
-            # Check if the child is a mesh
+    # Remove all empties (objects without geometry) in one batch instead of one by one
+    empties = [obj for obj in bpy.context.scene.objects if obj.type == 'EMPTY']
+    bpy.data.batch_remove(ids=empties)
+
+def collect_meshes_under_empty(empty_object):
+    # Iterative walk through nested empties, collecting the meshes below them
+    meshes = []
+    stack = [empty_object]
+    while stack:
+        node = stack.pop()
+        for child in node.children:
             if child.type == 'MESH':
-                # Select the mesh
-                child.select_set(True)
-                bpy.context.view_layer.objects.active = child
-            else:
-                select_meshes_under_empty(child.name)
-
-def rescale_object(obj, scale):
-    # Ensure the object has a mesh data
-    if obj.type == 'MESH':
-        bbox_dimensions = obj.dimensions
-        # Avoid division by zero for degenerate meshes
-        if bbox_dimensions.x <= 0 or bbox_dimensions.y <= 0 or bbox_dimensions.z <= 0:
-            print(f"Warning: {obj.name} has zero/negative dimensions, skipping rescale")
-            return
-        scale_factors = (
-                         scale["length"] / bbox_dimensions.x,
-                         scale["width"] / bbox_dimensions.y,
-                         scale["height"] / bbox_dimensions.z
-                        )
-        obj.scale = scale_factors
+                meshes.append(child)
+            elif child.type == 'EMPTY':
+                stack.append(child)
+    return meshes
 
+file_path = "scene_graph.json"
+with open(file_path, 'rb') as file:
+    raw = file.read()
+data = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
+# Collect the placeable objects and the room dimensions in a single pass
 objects_in_room = {}
-file_path = "scene_graph.json"
-with open(file_path, 'r') as file:
-    data = json.load(file)
-    for item in data:
-        if item["new_object_id"] not in ["south_wall", "north_wall", "east_wall", "west_wall", "middle of the room", "ceiling"]:
-            objects_in_room[item["new_object_id"]] = item
+room_width = 4.0
+room_depth = 4.0
+room_height = 2.5
+for item in data:
+    object_id = item["new_object_id"]
+    if object_id == "middle of the room":
+        room_width = item["size_in_meters"]["length"]
+        room_depth = item["size_in_meters"]["width"]
+    elif object_id == "ceiling":
+        room_height = item["position"]["z"]
+    elif object_id not in ROOM_LAYOUT_IDS:
+        objects_in_room[object_id] = item
 
 directory_path = os.path.join(os.getcwd(), "Assets")
-glb_file_paths = find_glb_files(directory_path)
-
+glb_file_paths = find_glb_files(directory_path, objects_in_room.keys())
+
+# Retrieval can pick the same asset for several objects (e.g. matching chairs), so
+# import each distinct GLB once and copy it for the remaining objects. Only files of
+# equal size can be identical, so only those are hashed
+glb_sizes = {item_id: os.path.getsize(path) for item_id, path in glb_file_paths.items()}
+size_counts = Counter(glb_sizes.values())
+imported_assets = {}
 for item_id, object_in_room in objects_in_room.items():
-    glb_file_path = os.path.join(directory_path, glb_file_paths[item_id])
-    import_glb(glb_file_path, item_id)
+    # find_glb_files already returns absolute paths
+    glb_file_path = glb_file_paths[item_id]
+    size = glb_sizes[item_id]
+    asset_key = (size, file_digest(glb_file_path)) if size_counts[size] > 1 else (size,)
+    if asset_key in imported_assets:
+        duplicate_imported(*imported_assets[asset_key], item_id)
+    else:
+        imported_assets[asset_key] = import_glb(glb_file_path, item_id)
+
+# Animations are never played, drop them so the depsgraph does not evaluate them
+for action in list(bpy.data.actions):
+    bpy.data.actions.remove(action)
 
 parents = get_highest_parent_objects()
 empty_parents = [parent for parent in parents if parent.type == "EMPTY"]
 print(empty_parents)
 
+# The scene is evaluated exactly twice before rendering: here, so world matrices
+# reflect the imported hierarchy, and after the transform bake below. Everything in
+# between writes object and mesh data directly instead of going through operators
+bpy.context.view_layer.update()
+
 for empty_parent in empty_parents:
-    bpy.ops.object.select_all(action='DESELECT')
-    select_meshes_under_empty(empty_parent.name)
-    
-    bpy.ops.object.join()
-    bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
-    
-    joined_object = bpy.context.view_layer.objects.active
-    if joined_object is not None:
-        joined_object.name = empty_parent.name + "-joined"
+    meshes = collect_meshes_under_empty(empty_parent)
+    if not meshes:
+        continue
+    # No origin_set here: the transform bake below drops the location and
+    # re-centers every mesh anyway
+    join_meshes(meshes, empty_parent.name + "-joined")
 
 bpy.context.view_layer.objects.active = None
 
 MSH_OBJS = [m for m in bpy.context.scene.objects if m.type == 'MESH']
 for OBJS in MSH_OBJS:
-    bpy.context.view_layer.objects.active = OBJS
-    bpy.ops.object.parent_clear(type='CLEAR_KEEP_TRANSFORM')
-    OBJS.location = (0.0, 0.0, 0.0)
-    bpy.context.view_layer.objects.active = OBJS
-    OBJS.select_set(True)
-    bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
-    bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
+    # Equivalent of parent_clear(CLEAR_KEEP_TRANSFORM), zeroing the location and
+    # transform_apply, done on the data API to avoid a depsgraph update per operator:
+    # bake the world rotation/scale into the mesh and reset the object transform
+    linear = OBJS.matrix_world.to_3x3().to_4x4()
+    OBJS.parent = None
+    OBJS.matrix_basis = Matrix.Identity(4)
+    OBJS.data.transform(linear)
+    set_origin_to_bounds_center(OBJS)
+bpy.context.view_layer.update()
 
 MSH_OBJS = [m for m in bpy.context.scene.objects if m.type == 'MESH']
+placed_objs = []
+placed_items = []
+unplaceable_objs = []
 for OBJS in MSH_OBJS:
     # Remove "-joined" suffix if present, but preserve hyphens in object names
     obj_name = OBJS.name.replace("-joined", "") if OBJS.name.endswith("-joined") else OBJS.name
@@ -144,56 +287,97 @@ for OBJS in MSH_OBJS:
     if "position" not in item or item.get("position") is None:
         print(f"Skipping {obj_name}: missing position data")
         # Delete the object since we can't place it
-        bpy.data.objects.remove(OBJS, do_unlink=True)
+        unplaceable_objs.append(OBJS)
         continue
 
     # Skip objects missing rotation data
     if "rotation" not in item or item.get("rotation") is None:
         print(f"Skipping {obj_name}: missing rotation data")
-        bpy.data.objects.remove(OBJS, do_unlink=True)
+        unplaceable_objs.append(OBJS)
         continue
 
-    object_position = (item["position"]["x"], item["position"]["y"], item["position"]["z"])  # X, Y, and Z coordinates
-    object_rotation_z = (item["rotation"]["z_angle"] / 180.0) * math.pi + math.pi # Rotation angles in radians around the X, Y, and Z axes
-
-    bpy.ops.object.select_all(action='DESELECT')
-    OBJS.select_set(True)
-    OBJS.location = object_position
-    bpy.ops.transform.rotate(value=object_rotation_z,  orient_axis='Z')
-    rescale_object(OBJS, item["size_in_meters"])
+    placed_objs.append(OBJS)
+    placed_items.append(item)
+
+bpy.data.batch_remove(ids=unplaceable_objs)
+
+# Compute positions, rotations and scale factors for all objects at once
+if placed_objs:
+    positions = np.array(
+        [[item["position"][k] for k in ("x", "y", "z")] for item in placed_items], dtype=np.float64
+    )
+    rotations_z = np.radians([item["rotation"]["z_angle"] for item in placed_items]) + math.pi
+    sizes = np.array(
+        [[item["size_in_meters"][k] for k in ("length", "width", "height")] for item in placed_items],
+        dtype=np.float64,
+    )
+    dimensions = np.array([obj.dimensions[:] for obj in placed_objs], dtype=np.float64)
+    # Avoid division by zero for degenerate meshes
+    valid = (dimensions > 0).all(axis=1)
+    scales = np.divide(sizes, dimensions, out=np.ones_like(sizes), where=dimensions > 0)
+
+    for obj, position, rotation_z, scale, ok in zip(placed_objs, positions, rotations_z, scales, valid):
+        obj.location = position
+        # bpy.ops.transform.rotate turns clockwise about +Z for positive values, so
+        # subtract to keep the orientation the operator used to produce
+        obj.rotation_euler.z -= rotation_z
+        if ok:
+            obj.scale = scale
+        else:
+            print(f"Warning: {obj.name} has zero/negative dimensions, skipping rescale")
 
-bpy.ops.object.select_all(action='DESELECT')
 delete_empty_objects()
 
-# Get room dimensions from scene graph
-room_width = 4.0
-room_depth = 4.0
-room_height = 2.5
-
-for item in data:
-    if item["new_object_id"] == "middle of the room":
-        room_width = item["size_in_meters"]["length"]
-        room_depth = item["size_in_meters"]["width"]
-    if item["new_object_id"] == "ceiling":
-        room_height = item["position"]["z"]
-
 # Don't create room walls for cleaner render - just show furniture
 # create_room(room_width, room_depth, room_height)
 
 # Create a simple floor plane instead
-bpy.ops.mesh.primitive_plane_add(size=max(room_width, room_depth) * 1.5, location=(room_width/2, room_depth/2, 0))
-floor = bpy.context.active_object
-floor.name = "Floor"
+half_size = max(room_width, room_depth) * 1.5 / 2
+floor = add_mesh_object(
+    "Floor",
+    [(-half_size, -half_size, 0), (half_size, -half_size, 0), (half_size, half_size, 0), (-half_size, half_size, 0)],
+    [(0, 1, 2, 3)],
+    location=(room_width/2, room_depth/2, 0),
+)
+
+def configure_render_engine(scene, engine):
+    if engine == 'CYCLES':
+        scene.render.engine = 'CYCLES'
+        scene.cycles.samples = CYCLES_SAMPLES
+        # Keep BVH and textures around between renders in the same Blender process
+        scene.render.use_persistent_data = True
+        scene.cycles.device = 'CPU'
+
+        # Use every GPU of the first backend that has one, otherwise stay on CPU
+        prefs = bpy.context.preferences.addons['cycles'].preferences
+        for device_type in CYCLES_DEVICE_TYPES:
+            try:
+                prefs.compute_device_type = device_type
+            except TypeError:
+                continue  # Backend not supported by this build
+            prefs.refresh_devices()
+            if any(device.type == device_type for device in prefs.devices):
+                for device in prefs.devices:
+                    device.use = device.type == device_type
+                scene.cycles.device = 'GPU'
+                break
+        print(f"Render engine: Cycles ({scene.cycles.device}, {CYCLES_SAMPLES} samples)")
+    else:
+        # Eevee's engine id is BLENDER_EEVEE_NEXT in Blender 4.2, BLENDER_EEVEE elsewhere
+        engines = {item.identifier for item in scene.render.bl_rna.properties['engine'].enum_items}
+        scene.render.engine = 'BLENDER_EEVEE_NEXT' if 'BLENDER_EEVEE_NEXT' in engines else 'BLENDER_EEVEE'
+        print(f"Render engine: {scene.render.engine}")
 
 # Setup camera for rendering
 def setup_camera_and_render(room_width, room_depth, room_height, output_path="render.png"):
     from mathutils import Vector
 
+    configure_render_engine(bpy.context.scene, RENDER_ENGINE)
+
     # Position camera to see the whole room from above corner
     camera = bpy.data.objects.get('Camera')
     if camera is None:
-        bpy.ops.object.camera_add()
-        camera = bpy.context.active_object
+        camera = add_object('Camera', bpy.data.cameras.new('Camera'))
 
     # Room center (looking at floor level where furniture is)
     room_center = Vector((room_width/2, room_depth/2, 0.5))
@@ -213,19 +397,21 @@ def setup_camera_and_render(room_width, room_depth, room_height, output_path="re
     bpy.context.scene.camera = camera
 
     # Remove existing lights
-    for obj in bpy.data.objects:
-        if obj.type == 'LIGHT':
-            bpy.data.objects.remove(obj, do_unlink=True)
+    bpy.data.batch_remove(ids=[obj for obj in bpy.data.objects if obj.type == 'LIGHT'])
 
     # Add sun light
-    bpy.ops.object.light_add(type='SUN', location=(room_width/2, room_depth/2, room_height + 2))
-    sun = bpy.context.active_object
+    sun = add_object(
+        'Sun', bpy.data.lights.new('Sun', type='SUN'),
+        location=(room_width/2, room_depth/2, room_height + 2),
+    )
     sun.data.energy = 3
     sun.rotation_euler = (math.radians(45), 0, math.radians(45))
 
     # Add point light inside room for fill
-    bpy.ops.object.light_add(type='POINT', location=(room_width/2, room_depth/2, room_height - 0.5))
-    point = bpy.context.active_object
+    point = add_object(
+        'Point', bpy.data.lights.new('Point', type='POINT'),
+        location=(room_width/2, room_depth/2, room_height - 0.5),
+    )
     point.data.energy = 500
 
     # Set world background to light blue-gray
@@ -241,10 +427,12 @@ def setup_camera_and_render(room_width, room_depth, room_height, output_path="re
     bpy.ops.render.render(write_still=True)
     print(f"Render saved to: {output_path}")
 
-# Save blend file
-blend_output = os.path.join(os.getcwd(), "scene.blend")
-bpy.ops.wm.save_as_mainfile(filepath=blend_output)
-print(f"Blend file saved to: {blend_output}")
+# Save blend file (opt-in, serializing the whole scene is costly and only render.png is
+# needed for evaluation)
+if SAVE_BLEND:
+    blend_output = os.path.join(os.getcwd(), "scene.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blend_output)
+    print(f"Blend file saved to: {blend_output}")
 
 # Render the scene
 render_output = os.path.join(os.getcwd(), "render.png")
@@ -4,34 +4,38 @@ Re-render IDesign scenes that have scene_graph.json and Assets but are missing r
 
 Usage:
     python rerender_missing.py --results_dir ~/efs/nicholas/scene-agent-eval-scenes/IDesign
+    python rerender_missing.py --results_dir ./scenes --workers 4 --threads 8
 """
 
 import argparse
-import subprocess
+import os
+import queue
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-BLENDER_PATH = "/snap/bin/blender"  # Use snap blender
-
-
-def run_blender(scene_dir: Path, script_dir: Path) -> bool:
-    """Run Blender rendering for a scene."""
-    blender_script = script_dir / "place_in_blender.py"
-    if not blender_script.exists():
-        print(f"  Error: place_in_blender.py not found at {blender_script}")
-        return False
+from blender_worker import BlenderWorker
 
-    print(f"  Running Blender rendering...")
-    result = subprocess.run(
-        [BLENDER_PATH, "--background", "--python", str(blender_script)],
-        cwd=str(scene_dir),
-        capture_output=True,
-        text=True,
-        timeout=1800,  # 30 minute timeout for complex scenes
-    )
-
-    if result.returncode != 0:
-        print(f"  Blender failed: {result.stderr[-500:] if result.stderr else 'no stderr'}")
+BLENDER_PATH = "/snap/bin/blender"  # Use snap blender
+DEFAULT_THREADS = 4  # Render threads per Blender process
+RENDER_TIMEOUT = 1800  # 30 minute timeout for complex scenes
+
+
+def run_blender(scene_dir: Path, workers: queue.Queue) -> bool:
+    """Render a scene on one of the idle persistent Blender workers."""
+    worker = workers.get()
+    try:
+        print(f"  [{scene_dir.name}] Running Blender rendering...")
+        ok, output = worker.render(
+            scene_dir, timeout=RENDER_TIMEOUT, log_file=scene_dir / "blender.log"
+        )
+    except TimeoutError as e:
+        ok, output = False, str(e)
+    finally:
+        workers.put(worker)
+
+    if not ok:
+        print(f"  [{scene_dir.name}] Blender failed: {output[-500:] if output else 'no output'}")
         return False
 
     return True
@@ -41,20 +45,34 @@ def main():
     parser = argparse.ArgumentParser(description="Re-render IDesign scenes missing render.png")
     parser.add_argument("--results_dir", type=str, required=True, help="IDesign results directory")
     parser.add_argument("--dry_run", action="store_true", help="Just list scenes, don't render")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of concurrent Blender processes (default: CPU count / --threads)"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=DEFAULT_THREADS,
+        help=f"Render threads per Blender process (default: {DEFAULT_THREADS})"
+    )
     args = parser.parse_args()
 
     results_dir = Path(args.results_dir)
     script_dir = Path(__file__).parent.resolve()
 
-    # Find scenes that need re-rendering
+    # Find scenes that need re-rendering. One directory listing per scene instead of
+    # a stat per file, which matters on network filesystems like EFS
+    with os.scandir(results_dir) as it:
+        scene_entries = sorted(
+            (entry for entry in it if entry.name.startswith("scene_") and entry.is_dir()),
+            key=lambda entry: entry.name,
+        )
+
     to_render = []
-    for scene_dir in sorted(results_dir.glob("scene_*")):
-        has_graph = (scene_dir / "scene_graph.json").exists()
-        has_assets = (scene_dir / "Assets").exists()
-        has_render = (scene_dir / "render.png").exists()
+    for entry in scene_entries:
+        with os.scandir(entry.path) as it:
+            names = {child.name for child in it}
 
-        if has_graph and has_assets and not has_render:
-            to_render.append(scene_dir)
+        if "scene_graph.json" in names and "Assets" in names and "render.png" not in names:
+            to_render.append(Path(entry.path))
 
     print(f"Found {len(to_render)} scenes needing re-render")
 
@@ -63,21 +81,64 @@ def main():
             print(f"  {scene_dir.name}")
         return
 
+    if not (script_dir / "blender_driver.py").exists():
+        print(f"Error: blender_driver.py not found in {script_dir}")
+        sys.exit(1)
+
+    # Each Blender render is independent, so run several at once; threads only wait on
+    # the subprocess, the rendering itself happens in the Blender processes
+    num_workers = args.workers or max(1, (os.cpu_count() or 1) // max(1, args.threads))
+    num_workers = max(1, min(num_workers, len(to_render)))
+    print(f"Rendering with {num_workers} workers x {args.threads} threads")
+
+    # One persistent Blender per worker thread, so Blender starts once per worker
+    # rather than once per scene
+    all_workers = [
+        BlenderWorker(BLENDER_PATH, script_dir, threads=args.threads) for _ in range(num_workers)
+    ]
+    workers = queue.Queue()
+    for worker in all_workers:
+        workers.put(worker)
+
     successful = 0
     failed = 0
-
-    for i, scene_dir in enumerate(to_render):
-        print(f"\n[{i+1}/{len(to_render)}] {scene_dir.name}")
-
-        if run_blender(scene_dir, script_dir):
-            if (scene_dir / "render.png").exists():
-                print(f"  Success!")
+    interrupted = False
+
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    try:
+        futures = {
+            executor.submit(run_blender, scene_dir, workers): scene_dir
+            for scene_dir in to_render
+        }
+        for i, future in enumerate(as_completed(futures)):
+            scene_dir = futures[future]
+            ok = future.result()
+
+            if ok and (scene_dir / "render.png").exists():
+                print(f"[{i+1}/{len(to_render)}] {scene_dir.name}: Success!")
                 successful += 1
+            elif ok:
+                print(f"[{i+1}/{len(to_render)}] {scene_dir.name}: Failed: render.png not created")
+                failed += 1
             else:
-                print(f"  Failed: render.png not created")
+                print(f"[{i+1}/{len(to_render)}] {scene_dir.name}: Failed")
                 failed += 1
-        else:
-            failed += 1
+        executor.shutdown()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n\nInterrupted! Cancelling remaining scenes...")
+        # Pending scenes would otherwise each restart Blender and render
+        executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        for worker in all_workers:
+            if interrupted:
+                worker.kill()  # Also ends renders still running on executor threads
+            else:
+                worker.close()
+
+    if interrupted:
+        print(f"Stopped. Successful: {successful}, Failed: {failed}")
+        sys.exit(130)
 
     print(f"\n{'='*50}")
     print(f"Done! Successful: {successful}, Failed: {failed}")
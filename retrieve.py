@@ -5,7 +5,6 @@ import json
 import numpy as np
 import transformers
 import threading
-import multiprocessing
 import sys, os, shutil
 import objaverse
 from torch.nn import functional as F
@@ -15,23 +14,17 @@ import re
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 EMBEDDINGS_DIR = os.path.join(SCRIPT_DIR, "OpenShape-Embeddings")
 
-#Print device
-print("Device: ", torch.cuda.get_device_name(0))
-
-# Load the Pointcloud Encoder
-pc_encoder = openshape.load_pc_encoder('openshape-pointbert-vitg14-rgb')
-
-# Get the pre-computed embeddings (stored in script directory, not cwd)
-meta = json.load(
-    open(hf_hub_download("OpenShape/openshape-objaverse-embeddings", "objaverse_meta.json", token=True, repo_type='dataset', local_dir=EMBEDDINGS_DIR))
-)
+f32 = np.float32
+half = torch.float16 if torch.cuda.is_available() else torch.bfloat16
 
-meta = {x['u']: x for x in meta['entries']}
-deser = torch.load(
-    hf_hub_download("OpenShape/openshape-objaverse-embeddings", "objaverse.pt", token=True, repo_type='dataset', local_dir=EMBEDDINGS_DIR), map_location='cpu'
-)
-us = deser['us']
-feats = deser['feats']
+# Models and embeddings, loaded once by load_models() and kept resident so that
+# batch runs (see run_from_csv.py) can retrieve assets for many scenes in one process
+pc_encoder = None
+meta = None
+us = None
+feats = None
+clip_model = None
+clip_prep = None
 
 def move_files(file_dict, destination_folder, id):
     os.makedirs(destination_folder, exist_ok=True)
@@ -93,35 +86,65 @@ def preprocess(input_string):
     output = wo_numericals.replace("_", " ")
     return output
 
-f32 = np.float32
-half = torch.float16 if torch.cuda.is_available() else torch.bfloat16
-clip_model, clip_prep = load_openclip()
-torch.set_grad_enabled(False)
-
-file_path = "scene_graph.json"
-
-with open(file_path, "r") as file:
-    objects_in_room = json.load(file)
-    
-for obj_in_room in objects_in_room:
-    if "style" in obj_in_room and "material" in obj_in_room:
-        style, material = obj_in_room['style'], obj_in_room["material"]
-    else:
-        continue
-    text = preprocess("A high-poly " + obj_in_room['new_object_id']) + f" with {material} material and in {style} style, high quality"
-    device = clip_model.device
-    tn = clip_prep(
-        text=[text], return_tensors='pt', truncation=True, max_length=76
-    ).to(device)
-    enc = clip_model.get_text_features(**tn).float().cpu()
-    retrieved_obj = retrieve(enc, top=1, sim_th=0.1, filter_fn=get_filter_fn())[0]
-    print("Retrieved object: ", retrieved_obj["u"])
-    processes = multiprocessing.cpu_count()
-    objaverse_objects = objaverse.load_objects(
-        uids=[retrieved_obj['u']],
-        download_processes=processes
+def load_models():
+    """Load the encoders and pre-computed embeddings on first use."""
+    global pc_encoder, meta, us, feats, clip_model, clip_prep
+    if clip_model is not None:
+        return
+
+    #Print device
+    print("Device: ", torch.cuda.get_device_name(0))
+
+    # Load the Pointcloud Encoder
+    pc_encoder = openshape.load_pc_encoder('openshape-pointbert-vitg14-rgb')
+
+    # Get the pre-computed embeddings (stored in script directory, not cwd)
+    meta = json.load(
+        open(hf_hub_download("OpenShape/openshape-objaverse-embeddings", "objaverse_meta.json", token=True, repo_type='dataset', local_dir=EMBEDDINGS_DIR))
     )
-    destination_folder = os.path.join(os.getcwd(), f"Assets/")
-    if not os.path.exists(destination_folder):
-        os.makedirs(destination_folder)
-    move_files(objaverse_objects, destination_folder, obj_in_room['new_object_id'])
\ No newline at end of file
+
+    meta = {x['u']: x for x in meta['entries']}
+    deser = torch.load(
+        hf_hub_download("OpenShape/openshape-objaverse-embeddings", "objaverse.pt", token=True, repo_type='dataset', local_dir=EMBEDDINGS_DIR), map_location='cpu'
+    )
+    us = deser['us']
+    feats = deser['feats']
+
+    clip_model, clip_prep = load_openclip()
+    torch.set_grad_enabled(False)
+
+def run(scene_dir):
+    """Retrieve an Objaverse asset for every object in scene_dir/scene_graph.json into scene_dir/Assets/."""
+    load_models()
+
+    file_path = os.path.join(scene_dir, "scene_graph.json")
+
+    with open(file_path, "r") as file:
+        objects_in_room = json.load(file)
+
+    for obj_in_room in objects_in_room:
+        if "style" in obj_in_room and "material" in obj_in_room:
+            style, material = obj_in_room['style'], obj_in_room["material"]
+        else:
+            continue
+        text = preprocess("A high-poly " + obj_in_room['new_object_id']) + f" with {material} material and in {style} style, high quality"
+        device = clip_model.device
+        tn = clip_prep(
+            text=[text], return_tensors='pt', truncation=True, max_length=76
+        ).to(device)
+        enc = clip_model.get_text_features(**tn).float().cpu()
+        retrieved_obj = retrieve(enc, top=1, sim_th=0.1, filter_fn=get_filter_fn())[0]
+        print("Retrieved object: ", retrieved_obj["u"])
+        # A single uid gains nothing from a download pool, and forking one inside the
+        # long-lived worker while prefetch threads are running risks deadlocks
+        objaverse_objects = objaverse.load_objects(
+            uids=[retrieved_obj['u']],
+            download_processes=1
+        )
+        destination_folder = os.path.join(scene_dir, "Assets", "")
+        if not os.path.exists(destination_folder):
+            os.makedirs(destination_folder)
+        move_files(objaverse_objects, destination_folder, obj_in_room['new_object_id'])
+
+if __name__ == "__main__":
+    run(os.getcwd())
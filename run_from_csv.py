@@ -8,18 +8,27 @@ Usage:
     python run_from_csv.py --start_id 5 --end_id 10         # Process only IDs 5-10
     python run_from_csv.py --skip_retrieve --skip_render    # Scene graph only
     python run_from_csv.py --skip_existing                  # Skip scenes with render.png
+    python run_from_csv.py --queue_file ids.txt             # Pull IDs from a shared queue
 """
 
 import argparse
 import csv
+import fcntl
+import hashlib
 import os
+import random
 import signal
-import subprocess
 import sys
+import threading
+import time
 import traceback
+from collections import deque
+from concurrent.futures import Future
 from pathlib import Path
 
+from blender_worker import BlenderWorker
 from generate_scene import generate_scene
+from scene_results import find_completed_scene_ids
 
 # Default paths
 CSV_FILE = str(Path.home() / "SceneEval/input/annotations.csv")
@@ -27,6 +36,8 @@ RESULTS_DIR = str(Path.home() / "efs/nicholas/scene-agent-eval-scenes/IDesign")
 BLENDER_PATH = "/home/ubuntu/blender-4.2.0-linux-x64/blender"
 MAX_RETRIES = 10
 DEFAULT_TIMEOUT = 3600  # 60 minutes per scene attempt
+MAX_RETRY_DELAY = 300  # Cap on the backoff between attempts, in seconds
+DEFAULT_PREFETCH = 1  # Upcoming scene graphs generated concurrently with the current scene
 
 
 class SceneTimeoutError(Exception):
@@ -39,68 +50,232 @@ def timeout_handler(signum, frame):
     raise SceneTimeoutError("Scene generation timed out")
 
 
-def run_retrieve(scene_dir: Path, script_dir: Path) -> bool:
+# Persistent Blender process shared by all scenes of this run, started on first use
+_blender_worker = None
+
+
+def get_blender_worker(script_dir: Path) -> BlenderWorker:
+    """Return the persistent Blender worker, creating it if needed."""
+    global _blender_worker
+    if _blender_worker is None:
+        # Keep scene.blend alongside the render unless explicitly disabled
+        env = {**os.environ, "IDESIGN_SAVE_BLEND": os.environ.get("IDESIGN_SAVE_BLEND", "1")}
+        _blender_worker = BlenderWorker(BLENDER_PATH, script_dir, env=env)
+    return _blender_worker
+
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """
+    Seconds to wait before retrying after a failed attempt.
+
+    Exponential backoff with jitter, so transient failures (rate limits, EFS hiccups,
+    CUDA OOM) get time to clear. Rate-limit responses that carry a Retry-After header
+    are honored instead. Both are capped at MAX_RETRY_DELAY.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None and getattr(error, "status_code", None) == 429:
+        try:
+            return min(MAX_RETRY_DELAY, float(headers.get("retry-after")))
+        except (TypeError, ValueError):
+            pass  # Missing or an HTTP date - fall back to backoff
+    return min(MAX_RETRY_DELAY, 2 ** (attempt - 1) + random.uniform(0, 1))
+
+
+def prompt_hash(description: str, auto_mode: bool) -> str:
+    """Hash of the Stage 1 inputs, stored next to scene_graph.json as .prompt_hash."""
+    return hashlib.sha256(f"{auto_mode}\n{description}".encode()).hexdigest()
+
+
+def generate_scene_graph(
+    scene_dir: Path,
+    description: str,
+    auto_mode: bool,
+    verbose: bool,
+    cancelled: threading.Event = None,
+    use_cache: bool = True,
+):
+    """
+    Stage 1: write scene_dir/scene_graph.json, unless it is already up to date for
+    this prompt (the GPT-4 calls are the expensive part of a retry).
+
+    The graph is generated into a temporary file and only moved into place if
+    cancelled is not set by then, so an abandoned prefetch can never replace a graph
+    the main thread has generated (and retrieved assets for) in the meantime.
+    use_cache=False ignores cached GPT-4 auto-mode responses.
+    """
+    output_file = scene_dir / "scene_graph.json"
+    hash_file = scene_dir / ".prompt_hash"
+    expected_hash = prompt_hash(description, auto_mode)
+    if output_file.exists() and hash_file.exists() and hash_file.read_text() == expected_hash:
+        print(f"  Scene graph up to date, skipping: {output_file}")
+        return
+
+    scene_dir.mkdir(parents=True, exist_ok=True)
+    # Stale until the new graph is written; later stages must rerun too
+    hash_file.unlink(missing_ok=True)
+    (scene_dir / ".stage").unlink(missing_ok=True)
+    tmp_file = scene_dir / f".scene_graph.{os.getpid()}.{threading.get_ident()}.json"
+    try:
+        generate_scene(
+            prompt=description,
+            output_file=str(tmp_file),
+            auto_mode=auto_mode,
+            verbose=verbose,
+            use_cache=use_cache,
+        )
+        if cancelled is not None and cancelled.is_set():
+            print(f"  Discarding abandoned scene graph for {scene_dir.name}")
+            return
+        os.replace(tmp_file, output_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    hash_file.write_text(expected_hash)
+    write_completed_stage(scene_dir, 1)
+    print(f"  Scene graph saved to: {output_file}")
+
+
+def start_prefetch(
+    scene_dir: Path, description: str, auto_mode: bool, verbose: bool, use_cache: bool = True
+) -> tuple:
+    """
+    Run Stage 1 for an upcoming scene on a background thread.
+
+    The thread is a daemon, so a GPT-4 session that never returns cannot keep the
+    worker process alive after the batch is done (a ThreadPoolExecutor's threads are
+    joined at interpreter exit). Setting the returned event makes the thread discard
+    its result.
+
+    Returns:
+        (future, cancelled) where future completes when the graph is written
+    """
+    future = Future()
+    cancelled = threading.Event()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            generate_scene_graph(scene_dir, description, auto_mode, verbose, cancelled, use_cache)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+
+    threading.Thread(target=run, name=f"prefetch-{scene_dir.name}", daemon=True).start()
+    return future, cancelled
+
+
+def reset_scene_markers(scene_dir: Path):
+    """
+    Forget the stage markers left by earlier runs. They only let retries within one
+    run skip finished stages, so a new run (e.g. after changing IDesign or the agent
+    config) never silently reuses an old scene graph or its assets.
+    """
+    (scene_dir / ".prompt_hash").unlink(missing_ok=True)
+    (scene_dir / ".stage").unlink(missing_ok=True)
+
+
+def read_completed_stage(scene_dir: Path) -> int:
+    """Last pipeline stage that finished for this scene, from scene_dir/.stage (0 if none)."""
+    try:
+        return int((scene_dir / ".stage").read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_completed_stage(scene_dir: Path, stage: int):
+    (scene_dir / ".stage").write_text(str(stage))
+
+
+def claim_next_scene_id(queue_file: str):
+    """
+    Pop the next scene ID from a shared queue file (one ID per line).
+
+    Several workers read the same file, so the read-and-rewrite happens under an
+    exclusive lock. Returns None once the queue is empty.
+    """
+    with open(queue_file, "r+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+        ids = f.read().split()
+        if not ids:
+            return None
+        f.seek(0)
+        f.write("".join(f"{scene_id}\n" for scene_id in ids[1:]))
+        f.truncate()
+    return int(ids[0])
+
+
+def iter_queue(queue_file: str):
+    """Yield scene IDs claimed from the queue file until it is empty."""
+    while True:
+        scene_id = claim_next_scene_id(queue_file)
+        if scene_id is None:
+            return
+        yield scene_id
+
+
+def read_prompts(csv_file: str) -> list:
+    """Read (ID, Description) pairs from the prompts CSV, ignoring other columns."""
+    with open(csv_file, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_col = header.index("ID")
+        description_col = header.index("Description")
+        return [(int(row[id_col]), row[description_col]) for row in reader if row]
+
+
+def run_retrieve(scene_dir: Path) -> bool:
     """
-    Run asset retrieval for a scene.
+    Run asset retrieval for a scene in this process.
 
     Args:
         scene_dir: Directory containing scene_graph.json
-        script_dir: Directory containing retrieve.py
 
     Returns:
         True if successful, False otherwise
     """
-    retrieve_script = script_dir / "retrieve.py"
-    if not retrieve_script.exists():
-        print(f"Warning: retrieve.py not found at {retrieve_script}")
-        return False
-
     print("  Running asset retrieval...")
-    result = subprocess.run(
-        [sys.executable, str(retrieve_script)],
-        cwd=str(scene_dir),
-        capture_output=True,
-        text=True,
-    )
-
-    if result.returncode != 0:
-        print(f"  Asset retrieval failed: {result.stderr}")
+    try:
+        # Imported here so that --skip_retrieve runs do not need the retrieval extras.
+        # The models load on the first call and stay resident for the following scenes
+        from retrieve import run as retrieve_assets
+        retrieve_assets(scene_dir)
+    except SceneTimeoutError:
+        raise
+    except Exception as e:
+        print(f"  Asset retrieval failed: {e}")
+        traceback.print_exc()
         return False
 
     print("  Asset retrieval complete")
     return True
 
 
-def run_blender(scene_dir: Path, script_dir: Path) -> bool:
+def run_blender(scene_dir: Path, script_dir: Path, timeout: float = None) -> bool:
     """
-    Run Blender rendering for a scene.
+    Run Blender rendering for a scene in the persistent Blender process.
 
     Args:
         scene_dir: Directory containing scene_graph.json and Assets/
-        script_dir: Directory containing place_in_blender.py
+        script_dir: Directory containing blender_driver.py and place_in_blender.py
+        timeout: Seconds before Blender is killed (None waits forever)
 
     Returns:
         True if successful, False otherwise
-    """
-    blender_script = script_dir / "place_in_blender.py"
-    if not blender_script.exists():
-        print(f"Warning: place_in_blender.py not found at {blender_script}")
-        return False
-
-    if not Path(BLENDER_PATH).exists():
-        print(f"Warning: Blender not found at {BLENDER_PATH}")
-        return False
 
+    Raises:
+        SceneTimeoutError: Rendering did not finish within timeout
+    """
     print("  Running Blender rendering...")
-    result = subprocess.run(
-        [BLENDER_PATH, "--background", "--python", str(blender_script)],
-        cwd=str(scene_dir),
-        capture_output=True,
-        text=True,
-    )
-
-    if result.returncode != 0:
-        print(f"  Blender rendering failed: {result.stderr}")
+    try:
+        ok, output = get_blender_worker(script_dir).render(
+            scene_dir, timeout=timeout, log_file=scene_dir / "blender.log"
+        )
+    except TimeoutError as e:
+        raise SceneTimeoutError(str(e)) from e
+
+    if not ok:
+        print(f"  Blender rendering failed: {output}")
         return False
 
     print("  Blender rendering complete")
@@ -119,6 +294,7 @@ Examples:
   %(prog)s --auto                             # Use GPT-4 for room parameters
   %(prog)s --skip_retrieve --skip_render      # Generate scene graphs only
   %(prog)s --skip_existing                    # Skip scenes with existing render.png
+  %(prog)s --queue_file ids.txt               # Process IDs claimed from a shared queue
         """
     )
 
@@ -146,12 +322,24 @@ Examples:
         default=None,
         help="End at this ID (inclusive)"
     )
+    parser.add_argument(
+        "--queue_file",
+        type=str,
+        default=None,
+        help="Claim scene IDs one at a time from this file (shared between workers)"
+    )
     parser.add_argument(
         "--auto",
         action=argparse.BooleanOptionalAction,
         default=True,
         help="Use GPT-4 to determine room parameters for each prompt (default: True)"
     )
+    parser.add_argument(
+        "--no_cache",
+        dest="use_cache",
+        action="store_false",
+        help="Ignore cached GPT-4 auto-mode responses (retries always ignore them)"
+    )
     parser.add_argument(
         "--verbose", "-v",
         action="store_true",
@@ -178,12 +366,36 @@ Examples:
         default=DEFAULT_TIMEOUT,
         help=f"Timeout per scene attempt in seconds (default: {DEFAULT_TIMEOUT} = 30 min)"
     )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=DEFAULT_PREFETCH,
+        help="Number of upcoming scene graphs to generate concurrently while the current "
+             "scene runs. Each runs its own GPT-4 session, so higher values risk rate limits; "
+             f"with --queue_file at most one scene is claimed ahead (0 disables, default: {DEFAULT_PREFETCH})"
+    )
 
     args = parser.parse_args()
 
     # Get script directory for locating retrieve.py and place_in_blender.py
     script_dir = Path(__file__).parent.resolve()
 
+    # Check the pipeline scripts once up front rather than failing every scene
+    required = []
+    if not args.skip_retrieve:
+        required.append(script_dir / "retrieve.py")
+    if not args.skip_render:
+        required += [
+            script_dir / "blender_driver.py",
+            script_dir / "place_in_blender.py",
+            Path(BLENDER_PATH),
+        ]
+    missing = [path for path in required if not path.exists()]
+    if missing:
+        for path in missing:
+            print(f"Error: {path} not found")
+        sys.exit(1)
+
     results_dir = Path(args.results_dir)
     results_dir.mkdir(parents=True, exist_ok=True)
 
@@ -193,113 +405,226 @@ Examples:
     print(f"CSV file: {args.csv_file}")
     print(f"Results dir: {results_dir}")
     print(f"Auto mode: {args.auto}")
+    print(f"Use auto-mode cache: {args.use_cache}")
     print(f"Skip retrieve: {args.skip_retrieve}")
     print(f"Skip render: {args.skip_render}")
     print(f"Skip existing: {args.skip_existing}")
     print(f"Timeout: {args.timeout}s ({args.timeout // 60} min)")
+    print(f"Prefetch scene graphs: {args.prefetch}")
     print(f"{'='*60}\n")
 
     # Read prompts from CSV
-    with open(args.csv_file, "r") as f:
-        prompts = list(csv.DictReader(f))
+    prompts = read_prompts(args.csv_file)
 
     total = len(prompts)
     print(f"Loaded {total} prompts from CSV\n")
 
+    if args.queue_file:
+        # Scenes are handed out one at a time, so a worker stuck on a hard scene does
+        # not hold back a range of easy ones that other workers could take
+        print(f"Claiming scene IDs from queue: {args.queue_file}\n")
+        descriptions = dict(prompts)
+        rows = (
+            (scene_id, descriptions[scene_id])
+            for scene_id in iter_queue(args.queue_file)
+            if scene_id in descriptions  # Queues may list IDs the CSV does not have
+        )
+    else:
+        rows = prompts
+
+    completed = set()
+    if args.skip_existing:
+        completed = find_completed_scene_ids(
+            results_dir,
+            {
+                prompt_id for prompt_id, _ in prompts
+                if (args.start_id is None or prompt_id >= args.start_id)
+                and (args.end_id is None or prompt_id <= args.end_id)
+            },
+        )
+        print(f"Found {len(completed)} scenes with an existing render.png\n")
+
     successful = 0
     failed = 0
     skipped = 0
 
-    for i, row in enumerate(prompts):
-        prompt_id = int(row["ID"])
-
-        # Filter by ID range
-        if args.start_id is not None and prompt_id < args.start_id:
-            skipped += 1
-            continue
-        if args.end_id is not None and prompt_id > args.end_id:
-            skipped += 1
-            continue
-
-        description = row["Description"]
-        scene_dir = results_dir / f"scene_{prompt_id:03d}"
-        render_file = scene_dir / "render.png"
-
-        # Skip if render already exists
-        if args.skip_existing and render_file.exists():
-            print(f"Skipping scene {prompt_id} (render.png exists)")
-            skipped += 1
-            continue
-
-        scene_dir.mkdir(parents=True, exist_ok=True)
-
-        print(f"\n{'='*60}")
-        print(f"Scene {prompt_id} ({i+1}/{total}): {description[:50]}...")
-        print(f"Output: {scene_dir}")
-        print(f"{'='*60}\n")
-
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                # Set up timeout for this attempt
-                signal.signal(signal.SIGALRM, timeout_handler)
-                signal.alarm(args.timeout)
-
-                # Stage 1: Generate scene graph
-                output_file = scene_dir / "scene_graph.json"
-                print(f"[Stage 1/3] Generating scene graph... (attempt {attempt}/{MAX_RETRIES})")
-                generate_scene(
-                    prompt=description,
-                    output_file=str(output_file),
-                    auto_mode=args.auto,
-                    verbose=args.verbose,
-                )
-                print(f"  Scene graph saved to: {output_file}")
-
-                # Stage 2: Retrieve assets
-                if not args.skip_retrieve:
-                    print("\n[Stage 2/3] Retrieving 3D assets...")
-                    if not run_retrieve(scene_dir, script_dir):
-                        raise RuntimeError("Asset retrieval failed")
-                else:
-                    print("\n[Stage 2/3] Skipping asset retrieval")
-
-                # Stage 3: Render in Blender
-                if not args.skip_render:
-                    print("\n[Stage 3/3] Rendering in Blender...")
-                    if not run_blender(scene_dir, script_dir):
-                        raise RuntimeError("Blender rendering failed")
-
-                    # Verify render.png was created
-                    if not render_file.exists():
-                        raise RuntimeError(f"render.png not found after Blender execution")
-                else:
-                    print("\n[Stage 3/3] Skipping Blender rendering")
-
-                # Cancel timeout on success
-                signal.alarm(0)
-
-                print(f"\nScene {prompt_id} completed successfully on attempt {attempt}!")
-                successful += 1
-                break  # Success - exit retry loop
-
-            except SceneTimeoutError:
-                signal.alarm(0)  # Cancel any pending alarm
-                print(f"\nAttempt {attempt}/{MAX_RETRIES} TIMED OUT for scene {prompt_id} (>{args.timeout}s)")
-                if attempt == MAX_RETRIES:
-                    print(f"Scene {prompt_id} failed after {MAX_RETRIES} attempts (all timed out)")
-                    failed += 1
-                else:
-                    print("Retrying...")
-
-            except Exception as e:
-                signal.alarm(0)  # Cancel any pending alarm
-                print(f"\nAttempt {attempt}/{MAX_RETRIES} failed for scene {prompt_id}: {e}")
-                traceback.print_exc()
-                if attempt == MAX_RETRIES:
-                    print(f"Scene {prompt_id} failed after {MAX_RETRIES} attempts")
-                    failed += 1
-                else:
-                    print("Retrying...")
+    def scenes_to_run():
+        """Yield (position, prompt_id, description, scene_dir) for scenes to process."""
+        nonlocal skipped
+        for i, (prompt_id, description) in enumerate(rows):
+
+            # Filter by ID range
+            if args.start_id is not None and prompt_id < args.start_id:
+                skipped += 1
+                continue
+            if args.end_id is not None and prompt_id > args.end_id:
+                skipped += 1
+                continue
+
+            # Skip if render already exists
+            if prompt_id in completed:
+                print(f"Skipping scene {prompt_id} (render.png exists)")
+                skipped += 1
+                continue
+
+            # Before any prefetch of this scene can start
+            scene_dir = results_dir / f"scene_{prompt_id:03d}"
+            reset_scene_markers(scene_dir)
+            yield i, prompt_id, description, scene_dir
+
+    # Stage 1 mostly waits on the OpenAI API while Stages 2 and 3 keep the GPU busy, so
+    # the graphs of up to --prefetch upcoming scenes are generated on background
+    # threads while the current scene runs. Their output interleaves in the log
+    # Scenes claimed from a shared queue are only claimed one ahead, so a worker stuck
+    # on a hard scene does not hold back scenes that idle workers could take
+    lookahead = min(args.prefetch, 1) if args.queue_file else args.prefetch
+    scenes = scenes_to_run()
+    upcoming = deque()  # Scenes after the current one, at most `lookahead` of them
+    prefetched = {}  # scene_dir -> (future, cancelled event) for its Stage 1
+    abandoned = []  # Futures of timed-out prefetches whose threads may still be running
+
+    def prefetch_upcoming():
+        # Only take a new scene once a prefetch slot is free. Abandoned prefetches keep
+        # their slot until they return, so hung GPT-4 sessions cannot pile up; with
+        # every slot hung, the next scenes generate their graphs in the main thread
+        abandoned[:] = [future for future in abandoned if not future.done()]
+        while (
+            len(upcoming) < lookahead
+            and len(abandoned) + sum(not future.done() for future, _ in prefetched.values())
+            < args.prefetch
+        ):
+            scene = next(scenes, None)
+            if scene is None:
+                break
+            upcoming.append(scene)
+            _, _, next_description, next_scene_dir = scene
+            prefetched[next_scene_dir] = start_prefetch(
+                next_scene_dir, next_description, args.auto, args.verbose, args.use_cache
+            )
+
+    interrupted = False
+    try:
+        while True:
+            scene = upcoming.popleft() if upcoming else next(scenes, None)
+            if scene is None:
+                break
+            i, prompt_id, description, scene_dir = scene
+            render_file = scene_dir / "render.png"
+
+            scene_dir.mkdir(parents=True, exist_ok=True)
+
+            print(f"\n{'='*60}")
+            print(f"Scene {prompt_id} ({i+1}/{total}): {description[:50]}...")
+            print(f"Output: {scene_dir}")
+            print(f"{'='*60}\n")
+
+            if args.prefetch > 0:
+                prefetch_upcoming()
+
+            for attempt in range(1, MAX_RETRIES + 1):
+                try:
+                    # Set up timeout for this attempt
+                    signal.signal(signal.SIGALRM, timeout_handler)
+                    signal.alarm(args.timeout)
+
+                    # Stage 1: Generate scene graph
+                    print(f"[Stage 1/3] Generating scene graph... (attempt {attempt}/{MAX_RETRIES})")
+                    if scene_dir in prefetched:
+                        # Started while an earlier scene was running; waiting counts
+                        # towards this attempt's timeout. Taken out of `prefetched` first,
+                        # so after a timeout the next attempt generates the graph in this
+                        # thread, where SIGALRM can interrupt it
+                        future, cancelled = prefetched.pop(scene_dir)
+                        try:
+                            future.result()
+                        except (SceneTimeoutError, KeyboardInterrupt):
+                            cancelled.set()
+                            if not future.cancel():  # Only fails once the thread has started
+                                abandoned.append(future)
+                            raise
+                        except Exception as e:
+                            print(f"  Prefetched scene graph generation failed: {e}")
+                    # A cached auto-mode response may be what failed the last attempt
+                    generate_scene_graph(
+                        scene_dir, description, args.auto, args.verbose,
+                        use_cache=args.use_cache and attempt == 1,
+                    )
+
+                    # Stage 2: Retrieve assets, unless they were retrieved for this scene graph
+                    # and only the render failed
+                    if not args.skip_retrieve:
+                        if read_completed_stage(scene_dir) >= 2 and (scene_dir / "Assets").is_dir():
+                            print("\n[Stage 2/3] Assets already retrieved, skipping")
+                        else:
+                            print("\n[Stage 2/3] Retrieving 3D assets...")
+                            if not run_retrieve(scene_dir):
+                                raise RuntimeError("Asset retrieval failed")
+                            write_completed_stage(scene_dir, 2)
+                    else:
+                        print("\n[Stage 2/3] Skipping asset retrieval")
+
+                    # Stage 3: Render in Blender
+                    if not args.skip_render:
+                        print("\n[Stage 3/3] Rendering in Blender...")
+                        # Hand the rest of this attempt's time to the worker instead of
+                        # letting SIGALRM interrupt it: it kills only the Blender process
+                        remaining = signal.alarm(0)
+                        if not run_blender(scene_dir, script_dir, timeout=remaining or None):
+                            raise RuntimeError("Blender rendering failed")
+
+                        # Verify render.png was created
+                        if not render_file.exists():
+                            raise RuntimeError(f"render.png not found after Blender execution")
+                        write_completed_stage(scene_dir, 3)
+                    else:
+                        print("\n[Stage 3/3] Skipping Blender rendering")
+
+                    # Cancel timeout on success
+                    signal.alarm(0)
+
+                    print(f"\nScene {prompt_id} completed successfully on attempt {attempt}!")
+                    successful += 1
+                    break  # Success - exit retry loop
+
+                except SceneTimeoutError:
+                    signal.alarm(0)  # Cancel any pending alarm
+                    print(f"\nAttempt {attempt}/{MAX_RETRIES} TIMED OUT for scene {prompt_id} (>{args.timeout}s)")
+                    if attempt == MAX_RETRIES:
+                        print(f"Scene {prompt_id} failed after {MAX_RETRIES} attempts (all timed out)")
+                        failed += 1
+                    else:
+                        print("Retrying...")
+
+                except Exception as e:
+                    signal.alarm(0)  # Cancel any pending alarm
+                    print(f"\nAttempt {attempt}/{MAX_RETRIES} failed for scene {prompt_id}: {e}")
+                    traceback.print_exc()
+                    if attempt == MAX_RETRIES:
+                        print(f"Scene {prompt_id} failed after {MAX_RETRIES} attempts")
+                        failed += 1
+                    else:
+                        delay = retry_delay(attempt, e)
+                        print(f"Retrying in {delay:.1f}s...")
+                        time.sleep(delay)
+    except KeyboardInterrupt:
+        interrupted = True
+        signal.alarm(0)
+        print("\n\nInterrupted! Stopping...")
+    finally:
+        # Prefetches nobody will use discard their result; their daemon threads do not
+        # hold up exit
+        for future, cancelled in prefetched.values():
+            cancelled.set()
+            future.cancel()
+        if _blender_worker is not None:
+            if interrupted:
+                _blender_worker.kill()  # Do not wait for a render nobody will use
+            else:
+                _blender_worker.close()
+
+    if interrupted:
+        print(f"Stopped. Successful: {successful}, Failed: {failed}, Skipped: {skipped}")
+        sys.exit(130)
 
     print(f"\n{'='*60}")
     print(f"Batch complete!")
@@ -3,8 +3,8 @@
 Run IDesign scene generation with multiple parallel workers.
 
 Usage:
-    python run_multiworker.py                          # 3 workers (default)
-    python run_multiworker.py --num_workers 2          # 2 workers (safer for GPU memory)
+    python run_multiworker.py                          # As many workers as GPU memory allows
+    python run_multiworker.py --num_workers 2          # 2 workers
     python run_multiworker.py --num_workers 4 --skip_existing
     python run_multiworker.py --start_id 100 --end_id 150 --num_workers 2
 """
@@ -12,59 +12,123 @@ Usage:
 import argparse
 import csv
 import os
+import queue
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
+from itertools import pairwise
 from pathlib import Path
 
+from scene_results import find_completed_scene_ids
+
 # Default paths
 SCRIPT_DIR = Path(__file__).parent.resolve()
 CSV_FILE = str(Path.home() / "SceneEval/input/annotations.csv")
 RESULTS_DIR = str(Path.home() / "efs/nicholas/scene-agent-eval-scenes/IDesign")
 LOG_DIR = SCRIPT_DIR / "logs"
+DEFAULT_NUM_WORKERS = 3  # Used when GPU memory cannot be queried
+PER_WORKER_GB = 6  # Approximate peak GPU memory of one worker (retrieval models + Blender)
+STATUS_INTERVAL = 10  # Seconds between status bar refreshes while no worker exits
+STATUS_LINE_CHARS = 40  # Characters of each worker's latest log line in the status bar
 
 
 def get_scene_ids(csv_file: str, start_id: int = None, end_id: int = None) -> list:
     """Get list of scene IDs from CSV file."""
-    with open(csv_file, "r") as f:
-        reader = csv.DictReader(f)
-        ids = [int(row["ID"]) for row in reader]
-
-    if start_id is not None:
-        ids = [i for i in ids if i >= start_id]
-    if end_id is not None:
-        ids = [i for i in ids if i <= end_id]
+    with open(csv_file, "r", newline="") as f:
+        reader = csv.reader(f)
+        id_col = next(reader).index("ID")
+        ids = [int(row[id_col]) for row in reader if row]
+
+    if start_id is not None or end_id is not None:
+        ids = [
+            i for i in ids
+            if (start_id is None or i >= start_id) and (end_id is None or i <= end_id)
+        ]
 
-    return sorted(ids)
+    # Annotation files are normally sorted by ID already; sort in place only if not
+    if any(a > b for a, b in pairwise(ids)):
+        ids.sort()
+    return ids
 
 
 def filter_incomplete_scenes(scene_ids: list, results_dir: str) -> list:
     """Filter to only scenes that don't have render.png."""
-    results_path = Path(results_dir)
-    incomplete = []
-    for scene_id in scene_ids:
-        render_file = results_path / f"scene_{scene_id:03d}" / "render.png"
-        if not render_file.exists():
-            incomplete.append(scene_id)
-    return incomplete
-
-
-def divide_work(scene_ids: list, num_workers: int) -> list:
-    """Divide scene IDs among workers as contiguous ranges."""
-    n = len(scene_ids)
-    chunk_size = n // num_workers
-    remainder = n % num_workers
-
-    chunks = []
-    start = 0
-    for i in range(num_workers):
-        # Distribute remainder across first few workers
-        size = chunk_size + (1 if i < remainder else 0)
-        chunks.append(scene_ids[start:start + size])
-        start += size
+    completed = find_completed_scene_ids(results_dir, set(scene_ids))
+    return [scene_id for scene_id in scene_ids if scene_id not in completed]
+
+
+def query_gpu_free_memory_gb() -> list:
+    """Return the free memory in GB of each GPU, or [] if it cannot be queried."""
+    try:
+        import pynvml
+    except ImportError:
+        pynvml = None
+
+    if pynvml is not None:
+        try:
+            pynvml.nvmlInit()
+            try:
+                return [
+                    pynvml.nvmlDeviceGetMemoryInfo(pynvml.nvmlDeviceGetHandleByIndex(i)).free / 2**30
+                    for i in range(pynvml.nvmlDeviceGetCount())
+                ]
+            finally:
+                pynvml.nvmlShutdown()
+        except pynvml.NVMLError:
+            pass
+
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--query-gpu=memory.free", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, check=True, timeout=30,
+        )
+        return [float(mib) / 1024 for mib in result.stdout.split()]
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return []
+
+
+def gpu_slots(gpu_free_gb: list) -> list:
+    """
+    GPU index for each worker that fits in free memory, interleaved across GPUs
+    (e.g. [0, 1, 0, 1, 0] for room for three workers on GPU 0 and two on GPU 1).
+    """
+    capacity = [int(free // PER_WORKER_GB) for free in gpu_free_gb]
+    return [
+        gpu
+        for round_index in range(max(capacity, default=0))
+        for gpu, fits in enumerate(capacity)
+        if fits > round_index
+    ]
+
+
+def write_queue_file(queue_file: Path, scene_ids: list):
+    """Write the scene IDs workers claim from, one per line (see run_from_csv.py)."""
+    with open(queue_file, "w") as f:
+        f.writelines(f"{scene_id}\n" for scene_id in scene_ids)
+
+
+def last_log_line(log_file: Path) -> str:
+    """Return the last non-empty line of a worker log, reading only its tail."""
+    try:
+        with open(log_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 4096))
+            lines = f.read().decode(errors="replace").splitlines()
+    except FileNotFoundError:
+        return ""
+    for line in reversed(lines):
+        line = line.strip()
+        if line:
+            return line[:STATUS_LINE_CHARS]
+    return ""
+
 
-    return chunks
+def wait_for_exit(worker_id: int, proc: subprocess.Popen, exits: queue.Queue):
+    """Block until a worker exits, then report its ID to the monitor."""
+    proc.wait()
+    exits.put(worker_id)
 
 
 def main():
@@ -76,8 +140,9 @@ def main():
     parser.add_argument(
         "--num_workers", "-n",
         type=int,
-        default=3,
-        help="Number of parallel workers (default: 3, recommended: 2-4 to avoid CUDA OOM)"
+        default=None,
+        help=f"Number of parallel workers (default: free GPU memory / {PER_WORKER_GB} GB, "
+             f"or {DEFAULT_NUM_WORKERS} if it cannot be queried)"
     )
     parser.add_argument(
         "--csv_file",
@@ -146,85 +211,98 @@ def main():
         print("No scenes to process!")
         return
 
-    # Divide work among workers
-    work_chunks = divide_work(scene_ids, args.num_workers)
+    # Size the worker pool to the GPU memory that is actually free, so workers do not
+    # run into CUDA OOM (and burn retries) on small GPUs or leave big ones idle
+    gpu_free_gb = query_gpu_free_memory_gb()
+    slots = gpu_slots(gpu_free_gb)
+    if gpu_free_gb:
+        gpu_workers = max(1, len(slots))
+        print(
+            f"GPUs: {len(gpu_free_gb)} with {', '.join(f'{free:.1f}' for free in gpu_free_gb)} GB free "
+            f"(room for {gpu_workers} workers at {PER_WORKER_GB} GB each)"
+        )
+    else:
+        gpu_workers = DEFAULT_NUM_WORKERS
+        print(f"Could not query GPU memory, defaulting to {DEFAULT_NUM_WORKERS} workers")
+
+    if args.num_workers is None:
+        num_workers = gpu_workers
+    else:
+        num_workers = args.num_workers
+        if gpu_free_gb and num_workers > gpu_workers:
+            print(f"Warning: {num_workers} workers may exceed free GPU memory (room for {gpu_workers})")
+    num_workers = max(1, min(num_workers, len(scene_ids)))
+
+    # Spread workers over the GPUs by free memory, unless the caller already chose
+    # the devices. Workers beyond the estimate wrap around the same slots
+    assign_gpus = len(gpu_free_gb) > 1 and "CUDA_VISIBLE_DEVICES" not in os.environ
+    slots = slots or list(range(len(gpu_free_gb)))
 
     # Create log directory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     run_log_dir = LOG_DIR / f"run_{timestamp}_{os.getpid()}"
     run_log_dir.mkdir(parents=True, exist_ok=True)
 
+    # Workers pull scene IDs from a shared queue instead of owning a fixed range, so
+    # one worker stuck on hard scenes does not leave the others idle at the end
+    queue_file = run_log_dir / "queue.txt"
+
     print("=" * 60)
     print("IDesign Multi-Worker Runner")
     print("=" * 60)
-    print(f"Total scenes: {len(scene_ids)}")
-    print(f"Workers: {args.num_workers}")
+    print(f"Total scenes: {len(scene_ids)} (IDs: {scene_ids[0]}-{scene_ids[-1]})")
+    print(f"Workers: {num_workers}")
     print(f"Results dir: {args.results_dir}")
     print(f"Log dir: {run_log_dir}")
+    print(f"Queue file: {queue_file}")
     print(f"Skip existing: {args.skip_existing}")
     print(f"Timeout: {args.timeout}s")
     print("=" * 60)
 
-    for i, chunk in enumerate(work_chunks):
-        if chunk:
-            print(f"Worker {i}: {len(chunk)} scenes (IDs: {chunk[0]}-{chunk[-1]})")
-        else:
-            print(f"Worker {i}: 0 scenes")
-
-    print("=" * 60)
+    cmd = [
+        sys.executable, str(SCRIPT_DIR / "run_from_csv.py"),
+        "--csv_file", args.csv_file,
+        "--results_dir", args.results_dir,
+        "--queue_file", str(queue_file),
+        "--timeout", str(args.timeout),
+    ]
+    if args.skip_existing:
+        cmd.append("--skip_existing")
+    if args.skip_retrieve:
+        cmd.append("--skip_retrieve")
+    if args.skip_render:
+        cmd.append("--skip_render")
 
     if args.dry_run:
-        print("\n[DRY RUN] Would execute the following commands:\n")
-        for i, chunk in enumerate(work_chunks):
-            if not chunk:
-                continue
-            cmd = [
-                sys.executable, str(SCRIPT_DIR / "run_from_csv.py"),
-                "--csv_file", args.csv_file,
-                "--results_dir", args.results_dir,
-                "--start_id", str(min(chunk)),
-                "--end_id", str(max(chunk)),
-                "--timeout", str(args.timeout),
-            ]
-            if args.skip_existing:
-                cmd.append("--skip_existing")
-            if args.skip_retrieve:
-                cmd.append("--skip_retrieve")
-            if args.skip_render:
-                cmd.append("--skip_render")
-            print(f"Worker {i}: {' '.join(cmd)}")
+        print("\n[DRY RUN] Would execute the following command in each worker:\n")
+        print(" ".join(cmd))
         return
 
-    # Launch workers
+    write_queue_file(queue_file, scene_ids)
+
+    # Launch workers. Unbuffered children so their logs can be followed live
     processes = []
     log_files = []
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
 
-    print(f"\nLaunching {args.num_workers} workers...\n")
-
-    for i, chunk in enumerate(work_chunks):
-        if not chunk:
-            continue
+    print(f"\nLaunching {num_workers} workers...\n")
 
+    for i in range(num_workers):
         log_file = run_log_dir / f"worker_{i}.log"
-        log_handle = open(log_file, "w")
+        log_handle = open(log_file, "w", buffering=1)
         log_files.append(log_handle)
 
-        cmd = [
-            sys.executable, str(SCRIPT_DIR / "run_from_csv.py"),
-            "--csv_file", args.csv_file,
-            "--results_dir", args.results_dir,
-            "--start_id", str(min(chunk)),
-            "--end_id", str(max(chunk)),
-            "--timeout", str(args.timeout),
-        ]
-        if args.skip_existing:
-            cmd.append("--skip_existing")
-        if args.skip_retrieve:
-            cmd.append("--skip_retrieve")
-        if args.skip_render:
-            cmd.append("--skip_render")
-
-        print(f"Starting worker {i}: scenes {min(chunk)}-{max(chunk)} ({len(chunk)} scenes)")
+        worker_env = env
+        if assign_gpus:
+            # nvidia-smi/NVML index GPUs in PCI bus order, CUDA does not by default
+            worker_env = {
+                **env,
+                "CUDA_DEVICE_ORDER": "PCI_BUS_ID",
+                "CUDA_VISIBLE_DEVICES": str(slots[i % len(slots)]),
+            }
+            print(f"Starting worker {i} on GPU {worker_env['CUDA_VISIBLE_DEVICES']}")
+        else:
+            print(f"Starting worker {i}")
         print(f"  Log: {log_file}")
 
         proc = subprocess.Popen(
@@ -232,24 +310,30 @@ def main():
             stdout=log_handle,
             stderr=subprocess.STDOUT,
             cwd=str(SCRIPT_DIR),
+            env=worker_env,
         )
-        processes.append((i, proc, chunk))
+        processes.append((i, proc, log_file))
 
     print(f"\nAll {len(processes)} workers started. Monitoring progress...\n")
     print("Press Ctrl+C to cancel all workers.\n")
 
-    # Monitor progress
+    # Monitor progress. The monitor sleeps on the exit queue, so it wakes up as soon as
+    # a worker exits and otherwise only to refresh the status bar
+    exits = queue.Queue()
+    for worker_id, proc, log_file in processes:
+        threading.Thread(target=wait_for_exit, args=(worker_id, proc, exits), daemon=True).start()
+
     try:
         start_time = time.time()
         while True:
             all_done = True
             status_parts = []
 
-            for worker_id, proc, chunk in processes:
+            for worker_id, proc, log_file in processes:
                 ret = proc.poll()
                 if ret is None:
                     all_done = False
-                    status_parts.append(f"W{worker_id}:running")
+                    status_parts.append(f"W{worker_id}:running {last_log_line(log_file)}")
                 elif ret == 0:
                     status_parts.append(f"W{worker_id}:done")
                 else:
@@ -257,20 +341,24 @@ def main():
 
             elapsed = time.time() - start_time
             elapsed_str = f"{int(elapsed // 3600)}h{int((elapsed % 3600) // 60)}m"
-            print(f"\r[{elapsed_str}] {' | '.join(status_parts)}", end="", flush=True)
+            # Clear to end of line, the previous status may have been longer
+            print(f"\r[{elapsed_str}] {' | '.join(status_parts)}\033[K", end="", flush=True)
 
             if all_done:
                 break
 
-            time.sleep(10)
+            try:
+                exits.get(timeout=STATUS_INTERVAL)
+            except queue.Empty:
+                pass
 
         print("\n")
 
     except KeyboardInterrupt:
         print("\n\nInterrupted! Terminating workers...")
-        for worker_id, proc, chunk in processes:
+        for worker_id, proc, log_file in processes:
             proc.terminate()
-        for worker_id, proc, chunk in processes:
+        for worker_id, proc, log_file in processes:
             proc.wait()
         print("All workers terminated.")
         return
@@ -284,10 +372,10 @@ def main():
     print("Run Complete!")
     print("=" * 60)
 
-    for worker_id, proc, chunk in processes:
+    for worker_id, proc, log_file in processes:
         ret = proc.returncode
         status = "SUCCESS" if ret == 0 else f"FAILED (exit code {ret})"
-        print(f"Worker {worker_id}: {status} ({len(chunk)} scenes)")
+        print(f"Worker {worker_id}: {status}")
 
     print(f"\nLogs saved to: {run_log_dir}")
     print("=" * 60)
@@ -0,0 +1,32 @@
+"""
+Helpers for inspecting a results directory of generated scenes.
+
+Shared by run_from_csv.py (one worker) and run_multiworker.py (the launcher), so
+neither script has to import the other.
+"""
+
+import os
+
+
+def find_completed_scene_ids(results_dir, scene_ids: set) -> set:
+    """
+    Return the IDs in scene_ids whose scene directory already has a render.png.
+
+    Lists the results directory once and only checks scene directories that exist,
+    instead of a stat per scene ID (slow on EFS).
+    """
+    completed = set()
+    try:
+        with os.scandir(results_dir) as it:
+            for entry in it:
+                if not entry.name.startswith("scene_"):
+                    continue
+                try:
+                    scene_id = int(entry.name[len("scene_"):])
+                except ValueError:
+                    continue
+                if scene_id in scene_ids and os.path.exists(os.path.join(entry.path, "render.png")):
+                    completed.add(scene_id)
+    except FileNotFoundError:
+        pass  # No results yet
+    return completed
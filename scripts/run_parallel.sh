@@ -1,5 +1,5 @@
 #!/bin/bash
-# Run IDesign scene generation in parallel by splitting scene ranges across workers
+# Run IDesign scene generation in parallel, with workers pulling scene IDs from a shared queue
 #
 # Usage: ./scripts/run_parallel.sh <start_id> <end_id> <num_workers> [extra_args...]
 #
@@ -41,9 +41,11 @@ RUN_ID="$(date +%Y%m%d_%H%M%S)_$$"
 LOG_DIR="logs/run_${RUN_ID}"
 mkdir -p "$LOG_DIR"
 
-# Calculate scenes per worker
+# Workers claim one scene ID at a time from this file (see run_from_csv.py --queue_file),
+# so a worker that hits a run of hard prompts does not hold up the others
 TOTAL_SCENES=$((END_ID - START_ID + 1))
-SCENES_PER_WORKER=$(( (TOTAL_SCENES + NUM_WORKERS - 1) / NUM_WORKERS ))  # Ceiling division
+QUEUE_FILE="${LOG_DIR}/queue.txt"
+seq "$START_ID" "$END_ID" > "$QUEUE_FILE"
 PIDS=()
 
 # Cleanup function to kill all workers
@@ -76,37 +78,18 @@ echo "Run ID: $RUN_ID"
 echo "Scene range: $START_ID - $END_ID"
 echo "Total scenes: $TOTAL_SCENES"
 echo "Workers: $NUM_WORKERS"
-echo "Scenes per worker: ~$SCENES_PER_WORKER"
+echo "Queue file: $QUEUE_FILE"
 echo "Extra args: $@"
 echo "Log directory: $LOG_DIR"
 echo "========================================"
 echo ""
 
 # Launch workers
-for ((i=0; i<NUM_WORKERS; i++)); do
-    WORKER_START=$((START_ID + i * SCENES_PER_WORKER))
-    WORKER_END=$((WORKER_START + SCENES_PER_WORKER - 1))
-
-    # Last worker gets remainder
-    if [ $i -eq $((NUM_WORKERS - 1)) ]; then
-        WORKER_END=$END_ID
-    fi
-
-    # Skip if this worker's range is beyond end
-    if [ $WORKER_START -gt $END_ID ]; then
-        continue
-    fi
-
-    # Cap worker end at END_ID
-    if [ $WORKER_END -gt $END_ID ]; then
-        WORKER_END=$END_ID
-    fi
-
-    echo "Starting worker $i: scenes [$WORKER_START - $WORKER_END]"
+for ((i=0; i<NUM_WORKERS && i<TOTAL_SCENES; i++)); do
+    echo "Starting worker $i"
 
     python run_from_csv.py \
-        --start_id "$WORKER_START" \
-        --end_id "$WORKER_END" \
+        --queue_file "$QUEUE_FILE" \
         "$@" \
         > "${LOG_DIR}/worker_${i}.log" 2>&1 &
 